@@ -0,0 +1,430 @@
+import os
+import sys
+import tty
+import math
+import time
+import select
+import threading
+from pyKinesis import (SHORT_HEADER,HEADER,CODECS,shortFrame,MGMSG_HW_REQ_INFO,MGMSG_HW_GET_INFO,
+	MGMSG_HW_START_UPDATEMSGS,MGMSG_HW_STOP_UPDATEMSGS,MGMSG_MOD_SET_CHANENABLESTATE,MGMSG_MOT_REQ_ENCCOUNTER,
+	MGMSG_MOT_GET_ENCCOUNTER,MGMSG_MOT_REQ_POSCOUNTER,MGMSG_MOT_GET_POSCOUNTER,MGMSG_MOT_MOVE_HOME,
+	MGMSG_MOT_MOVE_HOMED,MGMSG_MOT_MOVE_ABSOLUTE,MGMSG_MOT_MOVE_COMPLETED,MGMSG_MOT_REQ_DCSTATUSUPDATE,
+	MGMSG_MOT_GET_DCSTATUSUPDATE,MGMSG_MOT_ACK_DCSTATUSUPDATE,MGMSG_MOT_SET_VELPARAMS,MGMSG_MOT_REQ_VELPARAMS,
+	MGMSG_MOT_GET_VELPARAMS,MGMSG_MOT_MOVE_VELOCITY,MGMSG_MOT_MOVE_STOP,MGMSG_MOT_MOVE_STOPPED,
+	STATUS_MOVING_FORWARD,STATUS_MOVING_REVERSE,STATUS_HOMING,STATUS_HOMED,STATUS_ENABLED)
+
+'''
+Hardware-free simulation of a KDC101 K-Cube driving a PRMTZ8 rotation stage.
+
+The simulated cube speaks the same binary APT protocol as the real controller over a Linux pseudo-terminal,
+so a ThorController (or AsyncThorController) can be pointed at its port instead of a real COM port:
+
+	cube = SimulatedKCube(27000000)
+	cube.start()
+	controller = ThorController(cube.port,PRMTZ8_SCALE_FACTORS)
+	...
+	controller.Close_Port()
+	cube.stop()
+
+Moves follow a trapezoidal velocity profile using the configured velocity and acceleration, so move and homing
+times are realistic. Velocity moves ramp to the new speed at the same acceleration and run until the next move
+or stop command, and MGMSG_MOT_SET_VELPARAMS changes the profile of later moves as on the real cube. Running this file starts one simulated cube per serial number given on the command line:
+
+	python aptSimulator.py 27000000 27266892
+'''
+
+#PRMTZ8 scale factors [position, velocity, acceleration]
+PRMTZ8_SCALE_FACTORS = [1919.6418578623391,42941.66,14.66]
+
+#Interval between automatic status updates once MGMSG_HW_START_UPDATEMSGS is received
+UPDATE_INTERVAL = 0.1
+
+#Automatic status updates stop after this many are sent without a MGMSG_MOT_ACK_DCSTATUSUPDATE
+UNACKNOWLEDGED_UPDATES = 50
+
+
+class SimulatedKCube:
+
+	def __init__(self,serialNumber=27000000,Scale_Factors=PRMTZ8_SCALE_FACTORS,velocity=10.0,acceleration=10.0,
+		homeVelocity=10.0):
+
+		'''
+		Creates a simulated K-Cube on a new pseudo-terminal.
+		Input Arguements:
+			serialNumber - serial number reported in MGMSG_HW_GET_INFO
+
+			Scale_Factors - [position, velocity, acceleration] scale factors to convert real units to device units
+
+			velocity, acceleration - move profile in real units (degrees/s and degrees/s^2)
+
+			homeVelocity - homing velocity in real units
+		'''
+
+		self.serialNumber = serialNumber
+		self.posScaleFactor,self.velScaleFactor,self.accScaleFactor = Scale_Factors[:]
+		self.velocity = velocity
+		self.acceleration = acceleration
+		self.homeVelocity = homeVelocity
+		self.source_byte = 0x50
+
+		#Host side of the pty is the port handed to ThorController
+		self.master, self.slave = os.openpty()
+		tty.setraw(self.master)
+		tty.setraw(self.slave)
+		self.port = os.ttyname(self.slave)
+
+		self.lock = threading.Lock()
+		self.running = threading.Event()
+		self.thread = None
+		self.received = bytearray()
+
+		#Motion state in real units; a move runs from startPosition to targetPosition starting at startTime
+		self.enabled = False
+		self.homed = False
+		self.homing = False
+		self.startPosition = 0.0
+		self.targetPosition = 0.0
+		self.startTime = time.monotonic()
+		self.moveVelocity = velocity
+		self.moveDuration = 0.0
+		self.moveComplete = True
+
+		#Velocity moves ramp from jogStartVelocity to the signed jogVelocity starting at startTime
+		self.jogging = False
+		self.jogStartVelocity = 0.0
+		self.jogVelocity = 0.0
+		self.stopping = False
+
+		self.updating = False
+		self.nextUpdate = 0.0
+		self.unacknowledged = 0
+
+		#Number of frames and bytes received and sent, for load tests and benchmarks
+		self.framesReceived = 0
+		self.framesSent = 0
+		self.bytesReceived = 0
+		self.bytesSent = 0
+
+	def start(self):
+
+		'''Starts serving the protocol on a background thread'''
+
+		self.running.set()
+		self.thread = threading.Thread(target=self.run,name='Simulated KDC101 %s' % self.serialNumber)
+		self.thread.daemon = True
+		self.thread.start()
+		return self
+
+	def stop(self):
+
+		'''Stops the simulation and closes the pseudo-terminal'''
+
+		self.running.clear()
+		if self.thread is not None:
+			self.thread.join()
+		os.close(self.master)
+		os.close(self.slave)
+		return
+
+	def __enter__(self):
+
+		return self.start()
+
+	def __exit__(self,*exc_info):
+
+		self.stop()
+		return
+
+	def profileDuration(self,distance,velocity):
+
+		'''Duration of a trapezoidal (or triangular if too short to reach velocity) move profile'''
+
+		if distance <= velocity**2/self.acceleration:
+			return 2*math.sqrt(distance/self.acceleration)
+		return distance/velocity + velocity/self.acceleration
+
+	def position(self,now=None):
+
+		'''Returns the current position in real units along the active move profile'''
+
+		if now is None:
+			now = time.monotonic()
+
+		elapsed = now - self.startTime
+		if self.jogging:
+			#Constant acceleration until the new velocity is reached, then constant velocity
+			rampTime = self.rampTime()
+			ramp = min(elapsed,rampTime)
+			direction = 1 if self.jogVelocity >= self.jogStartVelocity else -1
+			travelled = self.jogStartVelocity*ramp + 0.5*direction*self.acceleration*ramp**2
+			return self.startPosition + travelled + self.jogVelocity*max(0.0,elapsed - rampTime)
+
+		if elapsed >= self.moveDuration:
+			return self.targetPosition
+
+		distance = abs(self.targetPosition - self.startPosition)
+		direction = 1 if self.targetPosition >= self.startPosition else -1
+		velocity = min(self.moveVelocity,math.sqrt(distance*self.acceleration))
+		rampTime = velocity/self.acceleration
+
+		if elapsed < rampTime:
+			travelled = 0.5*self.acceleration*elapsed**2
+		elif elapsed < self.moveDuration - rampTime:
+			travelled = 0.5*velocity*rampTime + velocity*(elapsed - rampTime)
+		else:
+			remaining = self.moveDuration - elapsed
+			travelled = distance - 0.5*self.acceleration*remaining**2
+
+		return self.startPosition + direction*travelled
+
+	def rampTime(self):
+
+		return abs(self.jogVelocity - self.jogStartVelocity)/self.acceleration
+
+	def currentVelocity(self,now):
+
+		if self.jogging:
+			elapsed = min(now - self.startTime,self.rampTime())
+			direction = 1 if self.jogVelocity >= self.jogStartVelocity else -1
+			return self.jogStartVelocity + direction*self.acceleration*elapsed
+		if now - self.startTime >= self.moveDuration:
+			return 0.0
+		return (self.position(now + 0.001) - self.position(now))/0.001
+
+	def statusBits(self,now):
+
+		bits = 0
+		if self.enabled:
+			bits |= STATUS_ENABLED
+		if self.homed:
+			bits |= STATUS_HOMED
+		if self.jogging:
+			velocity = self.currentVelocity(now)
+			if velocity > 0:
+				bits |= STATUS_MOVING_FORWARD
+			elif velocity < 0:
+				bits |= STATUS_MOVING_REVERSE
+		elif not self.moveComplete:
+			bits |= STATUS_MOVING_FORWARD if self.targetPosition >= self.startPosition else STATUS_MOVING_REVERSE
+			if self.homing:
+				bits |= STATUS_HOMING
+		return bits
+
+	def startMove(self,target,velocity,homing=False):
+
+		now = time.monotonic()
+		self.startPosition = self.position(now)
+		self.targetPosition = target
+		self.startTime = now
+		self.moveVelocity = velocity
+		self.moveDuration = self.profileDuration(abs(target - self.startPosition),velocity)
+		self.moveComplete = False
+		self.jogging = False
+		self.stopping = False
+		self.homing = homing
+		return
+
+	def startVelocity(self,velocity,stopping=False):
+
+		'''Ramps from the current velocity to the signed velocity, from an absolute move or another velocity move'''
+
+		now = time.monotonic()
+		self.startPosition = self.position(now)
+		self.jogStartVelocity = self.currentVelocity(now)
+		self.jogVelocity = velocity
+		self.startTime = now
+		self.jogging = True
+		self.stopping = stopping
+		self.moveComplete = True
+		self.homing = False
+		return
+
+	def halt(self,now):
+
+		'''Holds the stage at its current position'''
+
+		self.targetPosition = self.position(now)
+		self.startPosition = self.targetPosition
+		self.startTime = now
+		self.moveDuration = 0.0
+		self.moveComplete = True
+		self.jogging = False
+		self.stopping = False
+		self.homing = False
+		return
+
+	def send(self,frame):
+
+		os.write(self.master,frame)
+		self.framesSent += 1
+		self.bytesSent += len(frame)
+		return
+
+	def sendData(self,msgid,*fields):
+
+		codec = CODECS[msgid]
+		self.send(codec.frame.pack(msgid,codec.data.size,0x01|0x80,self.source_byte,*fields))
+		return
+
+	def sendStatus(self,msgid,now):
+
+		'''Sends a MGMSG_MOT_GET_DCSTATUSUPDATE packet, or the same packet after another header such as MOVE_COMPLETED'''
+
+		status = (1,int(round(self.position(now)*self.posScaleFactor)),
+			min(int(abs(self.currentVelocity(now))*204.8),0xFFFF),0,self.statusBits(now))
+		if msgid == MGMSG_MOT_GET_DCSTATUSUPDATE:
+			self.sendData(msgid,*status)
+		else:
+			dataLayout = CODECS[MGMSG_MOT_GET_DCSTATUSUPDATE].data
+			self.send(HEADER.pack(msgid,dataLayout.size,0x01|0x80,self.source_byte) + dataLayout.pack(*status))
+		return
+
+	def handle(self,msgid,param1,param2,data):
+
+		'''Acts on a single command received from the host'''
+
+		now = time.monotonic()
+		self.framesReceived += 1
+
+		if msgid == MGMSG_HW_REQ_INFO:
+			self.sendData(MGMSG_HW_GET_INFO,self.serialNumber,b'KDC101',16,0x00030001,b'Simulated KDC101',1,0,1)
+
+		elif msgid == MGMSG_MOD_SET_CHANENABLESTATE:
+			self.enabled = param2 == 0x01
+
+		elif msgid == MGMSG_MOT_MOVE_HOME:
+			self.startMove(0.0,self.homeVelocity,homing=True)
+
+		elif msgid == MGMSG_MOT_MOVE_ABSOLUTE:
+			channel, target = CODECS[MGMSG_MOT_MOVE_ABSOLUTE].data.unpack(data)
+			self.startMove(target/float(self.posScaleFactor),self.velocity)
+
+		elif msgid == MGMSG_MOT_SET_VELPARAMS:
+			channel, minVelocity, acceleration, maxVelocity = CODECS[MGMSG_MOT_SET_VELPARAMS].data.unpack(data)
+			self.velocity = maxVelocity/self.velScaleFactor
+			self.acceleration = acceleration/self.accScaleFactor
+
+		elif msgid == MGMSG_MOT_REQ_VELPARAMS:
+			self.sendData(MGMSG_MOT_GET_VELPARAMS,1,0,int(self.acceleration*self.accScaleFactor),
+				int(self.velocity*self.velScaleFactor))
+
+		elif msgid == MGMSG_MOT_MOVE_VELOCITY:
+			#Direction in parameter 2; 0x01 forward, 0x02 reverse
+			self.startVelocity(self.velocity if param2 == 0x01 else -self.velocity)
+
+		elif msgid == MGMSG_MOT_MOVE_STOP:
+			#Stop mode in parameter 2; 0x01 immediate, 0x02 profiled
+			if param2 == 0x01:
+				self.halt(now)
+				self.sendStatus(MGMSG_MOT_MOVE_STOPPED,now)
+			else:
+				self.startVelocity(0.0,stopping=True)
+
+		elif msgid == MGMSG_MOT_REQ_POSCOUNTER:
+			self.sendData(MGMSG_MOT_GET_POSCOUNTER,1,int(round(self.position(now)*self.posScaleFactor)))
+
+		elif msgid == MGMSG_MOT_REQ_ENCCOUNTER:
+			self.sendData(MGMSG_MOT_GET_ENCCOUNTER,1,int(round(self.position(now)*self.posScaleFactor)))
+
+		elif msgid == MGMSG_MOT_REQ_DCSTATUSUPDATE:
+			self.sendStatus(MGMSG_MOT_GET_DCSTATUSUPDATE,now)
+
+		elif msgid == MGMSG_MOT_ACK_DCSTATUSUPDATE:
+			self.unacknowledged = 0
+
+		elif msgid == MGMSG_HW_START_UPDATEMSGS:
+			self.updating = True
+			self.unacknowledged = 0
+			self.nextUpdate = now
+
+		elif msgid == MGMSG_HW_STOP_UPDATEMSGS:
+			self.updating = False
+
+		#Other commands (NO_FLASH_PROGRAMMING, MOD_IDENTIFY, ...) are accepted and ignored
+		return
+
+	def parse(self):
+
+		'''Handles every complete host frame in the receive buffer'''
+
+		while len(self.received) >= SHORT_HEADER.size:
+			msgid, param1, param2, dest, source = SHORT_HEADER.unpack_from(self.received)
+
+			if dest & 0x80:
+				length = param1 | (param2 << 8)
+				if len(self.received) < HEADER.size + length:
+					return
+				data = bytes(self.received[HEADER.size:HEADER.size+length])
+				del self.received[:HEADER.size+length]
+			else:
+				data = b''
+				del self.received[:SHORT_HEADER.size]
+
+			self.handle(msgid,param1,param2,data)
+		return
+
+	def run(self):
+
+		while self.running.is_set():
+			now = time.monotonic()
+
+			#Wake up for the next status update, the end of the active move, or to check for stop()
+			wakeups = [now + 0.05]
+			if not self.moveComplete:
+				wakeups.append(self.startTime + self.moveDuration)
+			if self.stopping:
+				wakeups.append(self.startTime + self.rampTime())
+			if self.updating:
+				wakeups.append(self.nextUpdate)
+
+			readable, unused, unused = select.select([self.master],[],[],max(0.0,min(wakeups) - now))
+			if readable:
+				try:
+					chunk = os.read(self.master,4096)
+				except OSError:
+					break
+				self.received += chunk
+				self.bytesReceived += len(chunk)
+				with self.lock:
+					self.parse()
+
+			now = time.monotonic()
+			with self.lock:
+				if not self.moveComplete and now - self.startTime >= self.moveDuration:
+					self.moveComplete = True
+					if self.homing:
+						self.homing = False
+						self.homed = True
+						self.send(shortFrame(MGMSG_MOT_MOVE_HOMED,0x01,0x00,0x01,self.source_byte))
+					else:
+						self.sendStatus(MGMSG_MOT_MOVE_COMPLETED,now)
+
+				if self.stopping and now - self.startTime >= self.rampTime():
+					self.halt(now)
+					self.sendStatus(MGMSG_MOT_MOVE_STOPPED,now)
+
+				if self.updating and now >= self.nextUpdate:
+					self.nextUpdate = now + UPDATE_INTERVAL
+					if self.unacknowledged < UNACKNOWLEDGED_UPDATES:
+						self.sendStatus(MGMSG_MOT_GET_DCSTATUSUPDATE,now)
+						self.unacknowledged += 1
+
+		return
+
+
+if __name__ == '__main__':
+
+	serialNumbers = [int(serialNumber) for serialNumber in sys.argv[1:]] or [27000000]
+	cubes = [SimulatedKCube(serialNumber).start() for serialNumber in serialNumbers]
+
+	for cube in cubes:
+		print("Simulated KDC101 {}: {}".format(cube.serialNumber,cube.port))
+
+	try:
+		while True:
+			time.sleep(1)
+	except KeyboardInterrupt:
+		pass
+
+	for cube in cubes:
+		cube.stop()
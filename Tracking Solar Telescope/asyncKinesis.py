@@ -0,0 +1,310 @@
+import os
+import asyncio
+import serial
+from pyKinesis import (ThorController,APTFrameDecoder,HEADER,MAX_DATA_LENGTH,REPLY_TIMEOUT,HOME_TIMEOUT,MOVE_TIMEOUT,
+	STAY_ALIVE_COMMANDS,
+	shortFrame,encodeInto,
+	MGMSG_MOD_SET_CHANENABLESTATE,MGMSG_MOT_ACK_DCSTATUSUPDATE,MGMSG_MOT_MOVE_HOME,MGMSG_MOT_MOVE_HOMED,
+	MGMSG_MOT_MOVE_ABSOLUTE,MGMSG_MOT_MOVE_COMPLETED,MGMSG_MOT_REQ_POSCOUNTER,MGMSG_MOT_GET_POSCOUNTER,
+	MGMSG_MOT_REQ_DCSTATUSUPDATE,MGMSG_MOT_GET_DCSTATUSUPDATE)
+
+'''
+asyncio version of the ThorController for driving several Thorlabs controllers from one event loop.
+
+Each controller registers its serial port's file descriptor with the event loop's selector (loop.add_reader),
+so received frames are decoded and dispatched as soon as they arrive without a reader thread per port.
+Commands are never written with a blocking write(): they are queued and written from the event loop whenever
+the port can take them (loop.add_writer). This needs a selector based event loop and a serial port with a file
+descriptor (Linux/macOS).
+
+As with ThorController, a reply is matched to the channel it came from and only to a request sent before it was
+received, a new move cancels the move of the channel it replaces, and a Stay_Alive is only sent once a channel has
+been sent STAY_ALIVE_COMMANDS commands.
+
+Example homing and moving two K-Cubes at the same time:
+
+	async def main():
+		azimuth = AsyncThorController('/dev/ttyUSB0',scale_factors)
+		elevation = AsyncThorController('/dev/ttyUSB1',scale_factors)
+		await asyncio.gather(azimuth.open(),elevation.open())
+
+		await asyncio.gather(azimuth.home(),elevation.home())
+		await asyncio.gather(azimuth.move_absolute(180.0),elevation.move_absolute(45.0))
+
+		azimuth.close()
+		elevation.close()
+
+	asyncio.run(main())
+'''
+
+
+class AsyncThorController:
+
+	def __init__(self,PORT,Scale_Factors,Controller_Type = 'cube'):
+
+		'''
+		Creates an asyncio Thorlabs Controller object. Arguments are the same as ThorController.
+
+		The serial port is opened in non-blocking mode; open() must be awaited from the event loop
+		before any command is sent.
+		'''
+
+		self.Controller_Type = Controller_Type.lower()
+		if self.Controller_Type not in ['cube','benchtop']:
+			raise Exception('Error: Invalid Controller Type')
+
+		self.port = PORT
+		self.posScaleFactor,self.velScaleFactor,self.accScaleFactor = Scale_Factors[:]
+		self.source_byte = 0x01
+		self.txBuffer = bytearray(HEADER.size + MAX_DATA_LENGTH)
+
+		#timeout=0 makes reads return immediately with whatever the selector reported as available
+		self.Serial_Port = serial.Serial(port = self.port, baudrate = 115200, bytesize=8,
+			parity=serial.PARITY_NONE, stopbits=1,timeout=0)
+
+		self.decoder = APTFrameDecoder()
+		#(sent time, future) waiting for a reply, per (message ID, source byte) in the order they were registered,
+		#and the future of the move still running per destination byte
+		self.pending = {}
+		self.pendingMoves = {}
+		self.subscribers = {}
+		self.loop = None
+
+		#Commands waiting for the port to accept them, and commands sent per destination since its last Stay_Alive
+		self.txQueue = bytearray()
+		self.writing = False
+		self.commandCounts = {}
+
+	#Destination byte rules are the same as for the blocking controller
+	get_destination_byte = ThorController.get_destination_byte
+
+	async def open(self):
+
+		'''Attaches the serial port to the running event loop'''
+
+		self.loop = asyncio.get_running_loop()
+		self.loop.add_reader(self.Serial_Port.fileno(),self.on_readable)
+		return
+
+	def close(self):
+
+		'''Detaches the serial port from the event loop, cancels pending replies and closes the port'''
+
+		if self.loop is not None:
+			self.loop.remove_reader(self.Serial_Port.fileno())
+			if self.writing:
+				self.loop.remove_writer(self.Serial_Port.fileno())
+				self.writing = False
+			self.loop = None
+		del self.txQueue[:]
+
+		for entries in self.pending.values():
+			for sent, future in entries:
+				future.cancel()
+		self.pending.clear()
+		self.pendingMoves.clear()
+
+		self.Serial_Port.close()
+		return
+
+	async def __aenter__(self):
+
+		await self.open()
+		return self
+
+	async def __aexit__(self,*exc_info):
+
+		self.close()
+		return
+
+	def subscribe(self,msgid,callback):
+
+		'''Calls callback(message) on the event loop for every received message with the given ID'''
+
+		self.subscribers.setdefault(msgid,[]).append(callback)
+		return
+
+	def unsubscribe(self,msgid,callback):
+
+		if callback in self.subscribers.get(msgid,[]):
+			self.subscribers[msgid].remove(callback)
+		return
+
+	def expect(self,msgid,source,sent=None):
+
+		'''
+		Returns an asyncio Future resolved with the next received message of the given ID from the source byte.
+		If sent (the loop.time() the request is sent at) is given, a message received before it does not resolve it.
+		'''
+
+		future = self.loop.create_future()
+		self.pending.setdefault((msgid,source),[]).append((sent,future))
+		return future
+
+	def on_readable(self):
+
+		'''Selector callback; decodes every complete frame that has arrived and dispatches it'''
+
+		try:
+			self.decoder.readinto(self.Serial_Port)
+		except (serial.SerialException,OSError) as error:
+			print("Port Error: Lost connection to '%s': %s" % (self.port,error))
+			self.close()
+			return
+
+		receivedTime = self.loop.time()
+		for message in self.decoder.frames():
+			#Only the oldest future still waiting is resolved; timed out and cancelled futures are dropped, and a
+			#future whose request was sent after the message was received is left for its own reply
+			entries = self.pending.get((message.msgid,message.source),[])
+			for entry in list(entries):
+				sent, future = entry
+				if future.done():
+					entries.remove(entry)
+				elif sent is None or sent <= receivedTime:
+					entries.remove(entry)
+					future.set_result(message)
+					break
+			for callback in list(self.subscribers.get(message.msgid,())):
+				callback(message)
+		return
+
+	def write(self,frame):
+
+		'''Queues bytes for the port and writes as much as it takes now; the rest is written from on_writable'''
+
+		self.txQueue += frame
+		if not self.writing:
+			self.on_writable()
+		return
+
+	def on_writable(self):
+
+		'''Selector callback; writes queued commands until the port would block'''
+
+		try:
+			written = os.write(self.Serial_Port.fileno(),self.txQueue)
+		except BlockingIOError:
+			written = 0
+		except OSError as error:
+			print("Port Error: Lost connection to '%s': %s" % (self.port,error))
+			self.close()
+			return
+		del self.txQueue[:written]
+
+		if self.txQueue and not self.writing:
+			self.loop.add_writer(self.Serial_Port.fileno(),self.on_writable)
+			self.writing = True
+		elif not self.txQueue and self.writing:
+			self.loop.remove_writer(self.Serial_Port.fileno())
+			self.writing = False
+		return
+
+	def send(self,frame,channel_num):
+
+		'''Writes a command, followed by a Stay_Alive every STAY_ALIVE_COMMANDS commands to the channel'''
+
+		dest = self.get_destination_byte(channel_num)
+		self.commandCounts[dest] = self.commandCounts.get(dest,0) + 1
+		if self.commandCounts[dest] >= STAY_ALIVE_COMMANDS:
+			frame = bytes(frame) + shortFrame(MGMSG_MOT_ACK_DCSTATUSUPDATE,0x00,0x00,dest,self.source_byte)
+			self.commandCounts[dest] = 0
+		self.write(frame)
+		return
+
+	def stay_alive(self,channel_num=1):
+
+		'''
+		Must be sent at least once every 50 commands to keep the connection alive. send() schedules it
+		automatically, so it only needs to be called directly to force one out immediately.
+		'''
+
+		dest = self.get_destination_byte(channel_num)
+		self.write(shortFrame(MGMSG_MOT_ACK_DCSTATUSUPDATE,0x00,0x00,dest,self.source_byte))
+		self.commandCounts[dest] = 0
+		return
+
+	async def request(self,frame,replyid,channel_num,timeout,move=False):
+
+		'''
+		Sends a command and waits for the reply with the given message ID from the channel.
+
+		If move is True the command replaces the move still running on the channel, whose future is cancelled
+		because the controller only reports the completion of the new move.
+		'''
+
+		dest = self.get_destination_byte(channel_num)
+		key = (replyid,dest)
+		sent = self.loop.time()
+		reply = self.expect(*key,sent=sent)
+		if move:
+			replaced = self.pendingMoves.get(dest)
+			if replaced is not None:
+				replaced.cancel()
+			self.pendingMoves[dest] = reply
+		self.send(frame,channel_num)
+		try:
+			return await asyncio.wait_for(reply,timeout)
+		finally:
+			#A reply that timed out or was cancelled is not left waiting
+			entries = self.pending.get(key,[])
+			if (sent,reply) in entries:
+				entries.remove((sent,reply))
+			if self.pendingMoves.get(dest) is reply:
+				del self.pendingMoves[dest]
+
+	async def enable_channel(self,channel_num=1):
+
+		'''Enables the channel and powers the motor coils'''
+
+		self.send(shortFrame(MGMSG_MOD_SET_CHANENABLESTATE,0x01,0x01,self.get_destination_byte(channel_num),self.source_byte),
+			channel_num)
+		await asyncio.sleep(0.1)
+		return
+
+	async def disable_channel(self,channel_num=1):
+
+		'''Disables the channel; the motor coils are no longer powered'''
+
+		self.send(shortFrame(MGMSG_MOD_SET_CHANENABLESTATE,0x01,0x02,self.get_destination_byte(channel_num),self.source_byte),
+			channel_num)
+		await asyncio.sleep(0.1)
+		return
+
+	async def home(self,channel_num=1,timeout=HOME_TIMEOUT):
+
+		'''Homes the stage and returns once MGMSG_MOT_MOVE_HOMED is received, within timeout seconds (None for no deadline)'''
+
+		frame = shortFrame(MGMSG_MOT_MOVE_HOME,0x01,0x00,self.get_destination_byte(channel_num),self.source_byte)
+		return await self.request(frame,MGMSG_MOT_MOVE_HOMED,channel_num,timeout)
+
+	async def move_absolute(self,Position,channel_num=1,timeout=MOVE_TIMEOUT):
+
+		'''
+		Moves the stage to the real unit position and returns once MGMSG_MOT_MOVE_COMPLETED is received, within
+		timeout seconds (None for no deadline).
+
+		A new move replaces a move of the channel that is still running, so awaiting the replaced move raises
+		asyncio.CancelledError.
+		'''
+
+		dUnitpos = int(self.posScaleFactor*Position)
+		frame = encodeInto(self.txBuffer,MGMSG_MOT_MOVE_ABSOLUTE,self.get_destination_byte(channel_num),
+			self.source_byte,0x01,dUnitpos)
+		return await self.request(frame,MGMSG_MOT_MOVE_COMPLETED,channel_num,timeout,move=True)
+
+	async def get_position(self,channel_num=1,timeout=REPLY_TIMEOUT):
+
+		'''Returns the real unit of the stages current position'''
+
+		frame = shortFrame(MGMSG_MOT_REQ_POSCOUNTER,0x01,0x00,self.get_destination_byte(channel_num),self.source_byte)
+		reply = await self.request(frame,MGMSG_MOT_GET_POSCOUNTER,channel_num,timeout)
+		return reply.data.position/float(self.posScaleFactor)
+
+	async def status(self,channel_num=1,timeout=REPLY_TIMEOUT):
+
+		'''Returns the real unit position and velocity from MGMSG_MOT_GET_DCSTATUSUPDATE'''
+
+		frame = shortFrame(MGMSG_MOT_REQ_DCSTATUSUPDATE,0x01,0x00,self.get_destination_byte(channel_num),self.source_byte)
+		reply = await self.request(frame,MGMSG_MOT_GET_DCSTATUSUPDATE,channel_num,timeout)
+		return (reply.data.position/self.posScaleFactor), (reply.data.velocity/204.8)
@@ -0,0 +1,197 @@
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+from pyKinesis import (ThorController,APTFrameDecoder,shortFrame,encodeInto,HEADER,MAX_DATA_LENGTH,CODECS,
+	MGMSG_MOT_MOVE_HOME,MGMSG_MOT_MOVE_ABSOLUTE,MGMSG_MOT_GET_DCSTATUSUPDATE)
+from aptSimulator import SimulatedKCube, PRMTZ8_SCALE_FACTORS
+
+'''
+Benchmarks every ThorController operation against a simulated KDC101 (aptSimulator.py) over a pseudo-terminal.
+
+For each operation it reports:
+	p50/p99    - wall clock latency per call in microseconds
+	msg/s      - APT frames exchanged with the cube per second (sent and received)
+	bytes/s    - bytes exchanged with the cube per second
+	cpu us     - process CPU time per call in microseconds (includes the reader and simulator threads)
+	alloc B    - bytes allocated per call, from the peak tracemalloc sees during each call (includes the threads)
+	peak KiB   - peak memory traced by tracemalloc while running the operation, a growing peak means retained objects
+
+Results can be saved and compared against a previous run to catch regressions in the protocol layer:
+
+	python benchmarkKinesis.py --save baseline.json
+	python benchmarkKinesis.py --compare baseline.json
+'''
+
+#A p50 latency or CPU time this much slower than the baseline is reported as a regression
+REGRESSION_THRESHOLD = 1.2
+
+#Operations with fewer calls than this are too noisy to be compared against the baseline
+REGRESSION_MIN_CALLS = 100
+
+#Seconds given to the simulator to answer and finish any move before traffic and memory are counted
+SETTLE_TIME = 0.25
+
+
+def percentile(samples,fraction):
+
+	ordered = sorted(samples)
+	return ordered[min(len(ordered)-1,int(fraction*len(ordered)))]
+
+def measure(name,operation,iterations,cube=None):
+
+	'''Runs operation(i) iterations times and returns its statistics'''
+
+	#Warm up caches (lru_cache frames, typed replies, ...) before measuring
+	for i in range(min(iterations,10)):
+		operation(i)
+
+	framesBefore = (cube.framesReceived + cube.framesSent) if cube else 0
+	bytesBefore = (cube.bytesReceived + cube.bytesSent) if cube else 0
+
+	samples = [0.0]*iterations
+	cpuStart = time.process_time()
+	wallStart = time.perf_counter()
+	for i in range(iterations):
+		start = time.perf_counter()
+		operation(i)
+		samples[i] = time.perf_counter() - start
+	wallTime = time.perf_counter() - wallStart
+	cpuTime = time.process_time() - cpuStart
+
+	#Let the simulator finish answering before counting its traffic
+	time.sleep(SETTLE_TIME if cube else 0)
+	frames = ((cube.framesReceived + cube.framesSent) - framesBefore) if cube else 0
+	transferred = ((cube.bytesReceived + cube.bytesSent) - bytesBefore) if cube else 0
+
+	#Allocations are measured in a second pass of the same calls, as tracing slows every allocation down. The
+	#peak is reset before each call, so the peak above the memory in use when it started is what it allocated
+	allocated = 0
+	tracemalloc.start()
+	for i in range(iterations):
+		tracemalloc.reset_peak()
+		start = tracemalloc.get_traced_memory()[0]
+		operation(i)
+		allocated += tracemalloc.get_traced_memory()[1] - start
+	time.sleep(SETTLE_TIME if cube else 0)
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+
+	return {
+		"operation": name,
+		"iterations": iterations,
+		"p50": percentile(samples,0.50)*1e6,
+		"p99": percentile(samples,0.99)*1e6,
+		"messages/s": frames/wallTime,
+		"bytes/s": transferred/wallTime,
+		"cpu": cpuTime/iterations*1e6,
+		"allocated": allocated/float(iterations),
+		"peak": peak/1024.0}
+
+def runBenchmarks(iterations):
+
+	results = []
+
+	#Protocol layer without any I/O
+	txBuffer = bytearray(HEADER.size + MAX_DATA_LENGTH)
+	results.append(measure('shortFrame',lambda i: shortFrame(MGMSG_MOT_MOVE_HOME,0x01,0x00,0x50),iterations*10))
+	results.append(measure('encodeInto',lambda i: encodeInto(txBuffer,MGMSG_MOT_MOVE_ABSOLUTE,0x50,0x01,0x01,i),iterations*10))
+
+	codec = CODECS[MGMSG_MOT_GET_DCSTATUSUPDATE]
+	statusFrame = codec.frame.pack(MGMSG_MOT_GET_DCSTATUSUPDATE,codec.data.size,0x81,0x50,1,1000,0,0,0)
+	decoder = APTFrameDecoder()
+	def decode(i):
+		decoder.feed(statusFrame)
+		for message in decoder.frames():
+			pass
+	results.append(measure('APTFrameDecoder',decode,iterations*10))
+
+	#Every ThorController operation against the simulated cube
+	cube = SimulatedKCube(27000000,velocity=1000.0,acceleration=10000.0,homeVelocity=1000.0).start()
+	controller = ThorController(cube.port,PRMTZ8_SCALE_FACTORS)
+	try:
+		controller.Enable_Channel(1)
+		controller.Home(1)
+
+		results.append(measure('Initialize',lambda i: controller.Initialize(1),iterations,cube))
+		results.append(measure('Stay_Alive',lambda i: controller.Stay_Alive(1),iterations,cube))
+		results.append(measure('Identify',lambda i: controller.Identify(1),iterations,cube))
+		results.append(measure('getPosition',lambda i: controller.getPosition(1),iterations,cube))
+		results.append(measure('getEncCounter',lambda i: controller.getEncCounter(1),iterations,cube))
+		results.append(measure('get_status_Update',lambda i: controller.get_status_Update(1),iterations,cube))
+		results.append(measure('Request_Status',lambda i: controller.Request_Status(1).result(),iterations,cube))
+		results.append(measure('Get_Velocity_Params',lambda i: controller.Get_Velocity_Params(1),iterations,cube))
+		results.append(measure('Set_Velocity_Params',lambda i: controller.Set_Velocity_Params(1000.0,10000.0,1),
+			iterations,cube))
+		results.append(measure('Move_Absolute stream',lambda i: controller.Move_Absolute(10.0 + (i % 100)*0.001,1,wait=False),
+			iterations,cube))
+		results.append(measure('Move_Absolute wait',lambda i: controller.Move_Absolute(10.0 + (i % 2)*0.01,1),
+			max(iterations//10,10),cube))
+		results.append(measure('Home',lambda i: controller.Home(1),max(iterations//100,5),cube))
+		results.append(measure('Disable_Channel',lambda i: controller.Disable_Channel(1),max(iterations//100,5),cube))
+		results.append(measure('Enable_Channel',lambda i: controller.Enable_Channel(1),max(iterations//100,5),cube))
+		results.append(measure('Stop',lambda i: controller.Stop(1),iterations,cube))
+		results.append(measure('Move_Velocity',lambda i: controller.Move_Velocity(0.01 + (i % 100)*0.0001,1.0,1),
+			iterations,cube))
+		controller.Stop(1)
+
+		controller.Start_Update_Messages(1)
+		time.sleep(0.2)
+		results.append(measure('Latest_Position',lambda i: controller.Latest_Position(1),iterations*10,cube))
+		controller.Stop_Update_Messages(1)
+
+		#Closing stops the reader thread, which waits for up to the port's read timeout
+		def reopen(i):
+			controller.Close_Port()
+			controller.Open_Port()
+		results.append(measure('Close_Port/Open_Port',reopen,max(iterations//100,5),cube))
+	finally:
+		controller.Close_Port()
+		cube.stop()
+
+	return results
+
+def printResults(results,baseline=None):
+
+	print("{:<22}{:>8}{:>12}{:>12}{:>12}{:>14}{:>10}{:>9}{:>10}".format(
+		'operation','calls','p50 us','p99 us','msg/s','bytes/s','cpu us','alloc B','peak KiB'))
+
+	regressions = []
+	for result in results:
+		line = "{operation:<22}{iterations:>8}{p50:>12.1f}{p99:>12.1f}{messages/s:>12.0f}{bytes/s:>14.0f}{cpu:>10.1f}{allocated:>9.0f}{peak:>10.1f}".format(**result)
+
+		previous = (baseline or {}).get(result["operation"])
+		if previous is not None and result["iterations"] >= REGRESSION_MIN_CALLS:
+			for key in ("p50","cpu"):
+				if previous[key] > 0 and result[key] > REGRESSION_THRESHOLD*previous[key]:
+					regressions.append(result["operation"])
+					line += "  REGRESSION {} {:.1f} -> {:.1f}".format(key,previous[key],result[key])
+		print(line)
+
+	return regressions
+
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description='Benchmark the pyKinesis protocol layer against a simulated KDC101')
+	parser.add_argument('-n','--iterations',type=int,default=1000,help='calls per request/response operation')
+	parser.add_argument('--save',help='write the results to this JSON file')
+	parser.add_argument('--compare',help='compare against results saved with --save; exits non-zero on a regression')
+	args = parser.parse_args()
+
+	results = runBenchmarks(args.iterations)
+
+	baseline = None
+	if args.compare:
+		with open(args.compare,"r") as file:
+			baseline = {result["operation"]: result for result in json.load(file)}
+
+	regressions = printResults(results,baseline)
+
+	if args.save:
+		with open(args.save,"w") as file:
+			json.dump(results,file,indent=1)
+
+	if regressions:
+		sys.exit(1)
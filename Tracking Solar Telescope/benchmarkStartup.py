@@ -0,0 +1,157 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+'''
+Benchmarks the cold start of the tracking software with python -X importtime.
+
+Every scenario is run in a fresh interpreter several times (after one run to write the .pyc files) and reports:
+	wall ms    - median wall clock time of the whole process, interpreter start up included
+	import ms  - median time spent importing modules, from -X importtime
+	heavy      - which of the heavy dependencies the scenario loaded
+	slowest    - the top level imports that took the longest
+
+A scenario that loads a heavy module it should not (NumPy for --list-devices, pylunar while tracking the Sun, ...)
+is reported and makes the benchmark exit non-zero, as does a regression against a saved run:
+
+	python benchmarkStartup.py --save startup.json
+	python benchmarkStartup.py --compare startup.json
+
+Nothing is moved; the --list-devices scenario only probes the COM ports, and writes its device cache to a temporary
+file instead of deviceCache.json.
+'''
+
+#Modules that dominate the start up time when they are loaded
+HEAVY_MODULES = ('numpy','pysolar','pylunar','ephem','serial')
+
+#(name, Python code run in a fresh interpreter, heavy modules it must not load)
+SCENARIOS = [
+	('import solarTracking','import solarTracking',('numpy','pysolar','pylunar','ephem')),
+	#The device cache goes to the temporary file runScenario() names, so the benchmark leaves deviceCache.json alone
+	('--list-devices','import os, sys, solarTracking; sys.argv[1:] = ["--list-devices"]; '
+		'solarTracking.deviceCacheFile = os.environ["BENCHMARK_DEVICE_CACHE"]; solarTracking.listDevices()',
+		('numpy','pysolar','pylunar','ephem')),
+	('import trackingEngine','import trackingEngine',('numpy','pysolar','pylunar','ephem')),
+	('Sun ephemeris','import trackingEngine; trackingEngine.objectEphemeris("Sun",-74.7527,41.0582)',('pylunar','ephem')),
+	('Moon ephemeris','import trackingEngine; trackingEngine.objectEphemeris("Moon",-74.7527,41.0582)',('pysolar',)),
+]
+
+#An import time this much slower than the baseline is reported as a regression
+REGRESSION_THRESHOLD = 1.2
+
+
+def median(samples):
+
+	ordered = sorted(samples)
+	return ordered[len(ordered)//2]
+
+def parseImportTime(output):
+
+	'''
+	Returns {module: cumulative seconds} for the top level imports in -X importtime output, and the set of every
+	module imported
+	'''
+
+	topLevel = {}
+	modules = set()
+	for line in output.splitlines():
+		if not line.startswith('import time:'):
+			continue
+		fields = line[len('import time:'):].split('|')
+		if len(fields) != 3 or not fields[1].strip().isdigit():
+			#Column header
+			continue
+		name = fields[2].rstrip()
+		module = name.strip()
+		modules.add(module)
+		#Nested imports are indented by two spaces per level
+		if len(name) - len(name.lstrip()) <= 1:
+			topLevel[module] = int(fields[1])/1e6
+	return topLevel, modules
+
+def runScenario(code):
+
+	'''Runs code in a fresh interpreter with -X importtime; returns the wall time and the importtime output'''
+
+	with tempfile.TemporaryDirectory() as directory:
+		environment = dict(os.environ,BENCHMARK_DEVICE_CACHE=os.path.join(directory,'deviceCache.json'))
+		start = time.perf_counter()
+		result = subprocess.run([sys.executable,'-X','importtime','-W','ignore','-c',code],env=environment,
+			cwd=os.path.dirname(os.path.abspath(__file__)),stdout=subprocess.DEVNULL,stderr=subprocess.PIPE,text=True)
+		wallTime = time.perf_counter() - start
+	if result.returncode != 0:
+		raise RuntimeError('Scenario failed:\n' + result.stderr)
+	return wallTime, result.stderr
+
+def measure(name,code,forbidden,runs):
+
+	#The first run compiles and caches the .pyc files, as they are on a host that has run the software before
+	runScenario(code)
+
+	wallTimes = []
+	importTimes = []
+	for i in range(runs):
+		wallTime, output = runScenario(code)
+		topLevel, modules = parseImportTime(output)
+		wallTimes.append(wallTime)
+		importTimes.append(sum(topLevel.values()))
+
+	heavy = [module for module in HEAVY_MODULES if module in modules]
+	slowest = sorted(topLevel.items(),key=lambda item: item[1],reverse=True)[:3]
+	return {
+		"scenario": name,
+		"wall": median(wallTimes)*1e3,
+		"import": median(importTimes)*1e3,
+		"heavy": heavy,
+		"unexpected": [module for module in heavy if module in forbidden],
+		"slowest": ['{} {:.1f}'.format(module,seconds*1e3) for module, seconds in slowest]}
+
+def printResults(results,baseline=None):
+
+	print("{:<24}{:>10}{:>11}  {:<34}{}".format('scenario','wall ms','import ms','heavy','slowest imports (ms)'))
+
+	failures = []
+	for result in results:
+		line = "{:<24}{:>10.1f}{:>11.1f}  {:<34}{}".format(result["scenario"],result["wall"],result["import"],
+			','.join(result["heavy"]) or '-',', '.join(result["slowest"]))
+
+		if result["unexpected"]:
+			failures.append(result["scenario"])
+			line += "  UNEXPECTED {}".format(','.join(result["unexpected"]))
+
+		previous = (baseline or {}).get(result["scenario"])
+		if previous is not None and previous["import"] > 0 and result["import"] > REGRESSION_THRESHOLD*previous["import"]:
+			failures.append(result["scenario"])
+			line += "  REGRESSION import {:.1f} -> {:.1f}".format(previous["import"],result["import"])
+		print(line)
+
+	return failures
+
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description='Benchmark the start up time of the tracking software')
+	parser.add_argument('-n','--runs',type=int,default=5,help='fresh interpreters started per scenario')
+	parser.add_argument('--save',help='write the results to this JSON file')
+	parser.add_argument('--compare',help='compare against results saved with --save; exits non-zero on a regression')
+	args = parser.parse_args()
+
+	results = [measure(name,code,forbidden,args.runs) for name, code, forbidden in SCENARIOS]
+
+	baseline = None
+	if args.compare:
+		with open(args.compare,"r") as file:
+			baseline = {result["scenario"]: result for result in json.load(file)}
+
+	failures = printResults(results,baseline)
+
+	if args.save:
+		with open(args.save,"w") as file:
+			json.dump(results,file,indent=1)
+
+	if failures:
+		sys.exit(1)
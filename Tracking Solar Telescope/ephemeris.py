@@ -0,0 +1,162 @@
+import time
+import datetime
+import numpy as np
+
+'''
+Precomputed ephemeris for the tracking loop.
+
+Instead of running the full solar/lunar position calculation every tick, the azimuth and elevation of the tracked
+object are computed once over a window (3 hours at 1 minute steps by default) and the loop interpolates them with
+cubic Hermite splines. A tick then costs a few microseconds instead of milliseconds.
+
+Atmospheric refraction bends the elevation sharply near the horizon, and pysolar stops applying it just below the
+horizon, a step that no spline follows. Given a refraction function the table holds positions without refraction
+and the refraction is added to the interpolated elevation instead, as is done for the Sun.
+
+Measured with 1 minute steps against the direct calculation, the interpolation error for the Sun is below 1e-6
+degrees, rising to 1e-4 degrees within 10 degrees of the zenith where the azimuth changes very quickly. For the
+Moon, whose refraction is applied inside pylunar, it is below 5e-5 degrees above the horizon (30 days at 41 degrees
+latitude), but reaches 0.015 degrees between 1 and 5 degrees below the horizon.
+'''
+
+#Length of the precomputed window and spacing of its samples, in seconds
+EPHEMERIS_WINDOW = 3*3600
+EPHEMERIS_STEP = 60
+
+#The table is rebuilt once a requested time is closer than this to the end of the window
+EPHEMERIS_MARGIN = 600
+
+#Elevation step in degrees for the slope of the refraction in rates()
+REFRACTION_DELTA = 0.001
+
+
+def toTimestamp(when):
+
+	'''Converts a timezone aware datetime (or None for now) to a POSIX timestamp'''
+
+	if when is None:
+		return time.time()
+	if isinstance(when,datetime.datetime):
+		return when.timestamp()
+	return float(when)
+
+
+class Ephemeris:
+
+	def __init__(self,positionFunction,window=EPHEMERIS_WINDOW,step=EPHEMERIS_STEP,batchFunction=None,start=None,
+		refractionFunction=None):
+
+		'''
+		Creates an interpolated ephemeris.
+		Input Arguements:
+			positionFunction - function(when) returning (azimuth, elevation) in degrees for a timezone aware datetime
+
+			window, step - seconds covered by the table and the spacing of its samples
+
+			batchFunction - optional function(timestamps) returning (azimuth array, elevation array) for a NumPy
+						array of POSIX timestamps. When given the table is filled in one vectorized call
+
+			start - POSIX timestamp or datetime the table starts at, defaults to now
+
+			refractionFunction - optional function(elevation) returning the refraction in degrees for an elevation
+							without refraction. When given the position and batch functions return elevations
+							without refraction, and it is added after interpolating
+		'''
+
+		self.positionFunction = positionFunction
+		self.batchFunction = batchFunction
+		self.refractionFunction = refractionFunction
+		self.window = window
+		self.step = float(step)
+		self.margin = min(EPHEMERIS_MARGIN,window/2.0)
+		self.build(toTimestamp(start))
+
+	def build(self,start):
+
+		'''Computes the table samples and Hermite tangents for the window starting at start'''
+
+		self.start = start
+		self.times = start + self.step*np.arange(int(np.ceil(self.window/self.step)) + 1)
+		self.end = self.times[-1]
+
+		if self.batchFunction is not None:
+			azimuth, elevation = self.batchFunction(self.times)
+		else:
+			positions = [self.positionFunction(datetime.datetime.fromtimestamp(timestamp,datetime.timezone.utc))
+				for timestamp in self.times]
+			azimuth, elevation = np.array(positions,dtype=float).T
+
+		#Unwrap the azimuth so the interpolation never runs the long way round through 0/360 degrees
+		self.azimuth = np.degrees(np.unwrap(np.radians(np.asarray(azimuth,dtype=float))))
+		self.elevation = np.asarray(elevation,dtype=float)
+
+		#Tangents of the Hermite splines in degrees per second
+		self.azimuthRate = np.gradient(self.azimuth,self.step,edge_order=2)
+		self.elevationRate = np.gradient(self.elevation,self.step,edge_order=2)
+
+		#Plain lists make the scalar lookups done every tick much cheaper than NumPy scalar indexing
+		self.samples = list(zip(self.azimuth.tolist(),self.elevation.tolist(),
+			(self.azimuthRate*self.step).tolist(),(self.elevationRate*self.step).tolist()))
+		return
+
+	def covers(self,timestamp):
+
+		return self.start <= timestamp <= self.end - self.margin
+
+	def segment(self,when):
+
+		'''Returns the table index and normalised position (0-1) within the step for a time, rebuilding if needed'''
+
+		timestamp = toTimestamp(when)
+		if not self.covers(timestamp):
+			self.build(timestamp)
+
+		index = min(int((timestamp - self.start)/self.step),len(self.samples) - 2)
+		return index, (timestamp - self.start)/self.step - index
+
+	def position(self,when=None):
+
+		'''Returns the interpolated (azimuth, elevation) in degrees, with the azimuth in the range 0-360'''
+
+		index, u = self.segment(when)
+		az0, el0, azTangent0, elTangent0 = self.samples[index]
+		az1, el1, azTangent1, elTangent1 = self.samples[index + 1]
+
+		#Cubic Hermite basis functions
+		u2 = u*u
+		u3 = u2*u
+		h00 = 2*u3 - 3*u2 + 1
+		h10 = u3 - 2*u2 + u
+		h01 = -2*u3 + 3*u2
+		h11 = u3 - u2
+
+		azimuth = h00*az0 + h10*azTangent0 + h01*az1 + h11*azTangent1
+		elevation = h00*el0 + h10*elTangent0 + h01*el1 + h11*elTangent1
+		if self.refractionFunction is not None:
+			elevation += self.refractionFunction(elevation)
+		return azimuth % 360, elevation
+
+	def rates(self,when=None):
+
+		'''Returns the (azimuth, elevation) angular rates in degrees per second from the spline derivative'''
+
+		index, u = self.segment(when)
+		az0, el0, azTangent0, elTangent0 = self.samples[index]
+		az1, el1, azTangent1, elTangent1 = self.samples[index + 1]
+
+		u2 = u*u
+		d00 = 6*u2 - 6*u
+		d10 = 3*u2 - 4*u + 1
+		d01 = -6*u2 + 6*u
+		d11 = 3*u2 - 2*u
+
+		azimuthRate = (d00*az0 + d10*azTangent0 + d01*az1 + d11*azTangent1)/self.step
+		elevationRate = (d00*el0 + d10*elTangent0 + d01*el1 + d11*elTangent1)/self.step
+		if self.refractionFunction is not None:
+			#Chain rule through the refraction, with its slope at the interpolated elevation by central difference
+			u3 = u2*u
+			elevation = (2*u3 - 3*u2 + 1)*el0 + (u3 - 2*u2 + u)*elTangent0 + (-2*u3 + 3*u2)*el1 + (u3 - u2)*elTangent1
+			slope = (self.refractionFunction(elevation + REFRACTION_DELTA)
+				- self.refractionFunction(elevation - REFRACTION_DELTA))/(2*REFRACTION_DELTA)
+			elevationRate *= 1 + slope
+		return azimuthRate, elevationRate
@@ -0,0 +1,60 @@
+import datetime
+import numpy as np
+import pylunar as pl
+
+'''
+Lunar position for the tracking loop.
+
+pylunar's MoonInfo parses the observer location and sets up its ephem Observer and Moon when it is created,
+so creating one for every position is most of the cost of a lunar position. A MoonTracker creates its MoonInfo
+once for the observer and afterwards only calls update() with the new time.
+
+Used as the position function of an ephemeris.Ephemeris the Moon is computed once per table sample and
+interpolated in between, giving lunar tracking the same per tick cost as solar tracking:
+
+	moon = MoonTracker(latitude,longitude)
+	ephemeris = Ephemeris(moon.position,batchFunction=moon.positions)
+'''
+
+
+def decdeg2dms(dd):
+	#convert decimal degrees to degrees, minutes, seconds
+    mult = -1 if dd < 0 else 1
+    mnt,sec = divmod(abs(dd)*3600, 60)
+    deg,mnt = divmod(mnt, 60)
+    return mult*deg, mult*mnt, mult*sec
+
+
+class MoonTracker:
+
+	def __init__(self,Latitude,Longitude):
+
+		'''
+		Creates a lunar position calculator bound to one observer.
+		Input Arguements:
+			Latitude, Longitude - observer position in degrees
+		'''
+
+		self.latitude = Latitude
+		self.longitude = Longitude
+		self.moon = pl.MoonInfo(decdeg2dms(Latitude), decdeg2dms(Longitude))
+
+	def position(self,when=None):
+
+		'''Returns the Moon's (azimuth, elevation) in degrees at a timezone aware datetime, defaults to now'''
+
+		if when is None:
+			when = datetime.datetime.now(datetime.timezone.utc)
+
+		self.moon.update(when)
+		return self.moon.azimuth(), self.moon.altitude()
+
+	def positions(self,timestamps):
+
+		'''Returns arrays of (azimuth, elevation) in degrees for an array of POSIX timestamps'''
+
+		azimuth = np.empty(len(timestamps))
+		elevation = np.empty(len(timestamps))
+		for i, timestamp in enumerate(timestamps):
+			azimuth[i], elevation[i] = self.position(datetime.datetime.fromtimestamp(timestamp,datetime.timezone.utc))
+		return azimuth, elevation
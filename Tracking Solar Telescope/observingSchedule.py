@@ -0,0 +1,148 @@
+import datetime
+from collections import namedtuple
+import numpy as np
+from ephemeris import toTimestamp
+
+'''
+Daily observing schedule of the tracked object.
+
+The object's elevation is computed over the next two days at one minute steps in one vectorized call, and the
+times it rises above and sets below the horizon, its transits and the windows in which it is visible are found
+from it. The tracking engine uses the schedule to park the mount while the object is down, without any serial
+traffic, and to pre-slew to where the object will rise shortly before it does:
+
+	schedule = ObservingSchedule(ephemeris.batchFunction,horizon=0.0)
+	schedule.visible(now)
+	schedule.nextRise(now)
+
+Two days are computed so the next rise is always known, even just after a set. The schedule is rebuilt from the
+current time once a day.
+'''
+
+#Length of the schedule and spacing of its samples, in seconds
+SCHEDULE_LENGTH = 2*86400
+SCHEDULE_STEP = 60
+
+#The schedule is rebuilt once this much of it has passed
+SCHEDULE_REFRESH = 86400
+
+#A rise, transit or set; kind is "rise", "transit" or "set", timestamp a POSIX timestamp, and the position in degrees
+ScheduleEvent = namedtuple('ScheduleEvent',['kind','timestamp','azimuth','elevation'])
+
+
+class ObservingSchedule:
+
+	def __init__(self,batchFunction,horizon=0.0,start=None,length=SCHEDULE_LENGTH,step=SCHEDULE_STEP):
+
+		'''
+		Computes the schedule.
+		Input Arguements:
+			batchFunction - function(timestamps) returning (azimuth array, elevation array) in degrees for a NumPy
+						array of POSIX timestamps, as the batchFunction of an Ephemeris
+
+			horizon - elevation in degrees the object must be above to be observed
+
+			start - POSIX timestamp or datetime the schedule starts at, defaults to now
+
+			length, step - seconds covered by the schedule and the spacing of its samples
+		'''
+
+		self.batchFunction = batchFunction
+		self.horizon = horizon
+		self.length = length
+		self.step = float(step)
+		self.build(toTimestamp(start))
+
+	def build(self,start):
+
+		'''Finds the rises, sets, transits and visibility windows from start'''
+
+		self.start = start
+		self.end = start + self.length
+		times = start + self.step*np.arange(int(np.ceil(self.length/self.step)) + 1)
+		azimuth, elevation = self.batchFunction(times)
+		azimuth = np.asarray(azimuth,dtype=float)
+		elevation = np.asarray(elevation,dtype=float)
+		height = elevation - self.horizon
+
+		def interpolate(values,index,fraction):
+			return float(values[index] + fraction*(values[index + 1] - values[index]))
+
+		events = []
+
+		#Horizon crossings between samples, placed by linear interpolation of the elevation
+		above = height >= 0
+		for index in np.flatnonzero(above[:-1] != above[1:]):
+			fraction = height[index]/(height[index] - height[index + 1])
+			kind = "rise" if above[index + 1] else "set"
+			events.append(ScheduleEvent(kind,interpolate(times,index,fraction),interpolate(azimuth,index,fraction),self.horizon))
+
+		#Transits at the elevation maxima, refined with a parabola through the neighbouring samples
+		for index in np.flatnonzero((elevation[1:-1] > elevation[:-2]) & (elevation[1:-1] >= elevation[2:])) + 1:
+			curvature = elevation[index - 1] - 2*elevation[index] + elevation[index + 1]
+			offset = 0.5*(elevation[index - 1] - elevation[index + 1])/curvature if curvature != 0 else 0.0
+			peak = elevation[index] - 0.25*(elevation[index - 1] - elevation[index + 1])*offset
+			events.append(ScheduleEvent("transit",float(times[index] + offset*self.step),float(azimuth[index]),float(peak)))
+
+		self.events = sorted(events,key=lambda event: event.timestamp)
+
+		#Visibility windows as (start, end) timestamps; a window open at either end of the schedule is cut there
+		self.windows = []
+		windowStart = start if above[0] else None
+		for event in self.events:
+			if event.kind == "rise":
+				windowStart = event.timestamp
+			elif event.kind == "set" and windowStart is not None:
+				self.windows.append((windowStart,event.timestamp))
+				windowStart = None
+		if windowStart is not None:
+			self.windows.append((windowStart,self.end))
+		return
+
+	def refresh(self,timestamp):
+
+		'''Rebuilds the schedule from timestamp once a day'''
+
+		if not self.start <= timestamp <= self.start + SCHEDULE_REFRESH:
+			self.build(timestamp)
+		return
+
+	def window(self,when=None):
+
+		'''Returns the (start, end) of the visibility window containing a time, or None if the object is down'''
+
+		timestamp = toTimestamp(when)
+		self.refresh(timestamp)
+		for window in self.windows:
+			if window[0] <= timestamp < window[1]:
+				return window
+		return None
+
+	def visible(self,when=None):
+
+		return self.window(when) is not None
+
+	def nextRise(self,when=None):
+
+		'''Returns the timestamp of the next rise after a time, or None if the object does not rise in the schedule'''
+
+		timestamp = toTimestamp(when)
+		self.refresh(timestamp)
+		for event in self.events:
+			if event.kind == "rise" and event.timestamp > timestamp:
+				return event.timestamp
+		return None
+
+	def summary(self,when=None,hours=24):
+
+		'''Returns a line per rise, transit and set in the hours after a time, in local time'''
+
+		timestamp = toTimestamp(when)
+		self.refresh(timestamp)
+		lines = []
+		for event in self.events:
+			if timestamp <= event.timestamp <= timestamp + hours*3600:
+				lines.append("{:<8}{}   Azimuth: {:.2f}   Elevation: {:.2f}".format(event.kind.capitalize(),
+					datetime.datetime.fromtimestamp(event.timestamp).strftime('%Y-%m-%d %H:%M:%S'),
+					event.azimuth % 360,event.elevation))
+		return lines
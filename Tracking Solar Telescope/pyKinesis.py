@@ -1,6 +1,12 @@
 import serial
 import serial.tools.list_ports
-from struct import pack,unpack
+from struct import Struct
+from collections import namedtuple
+from functools import lru_cache
+from concurrent.futures import Future,FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures import wait as waitFutures
+import threading
 import time
 
 '''
@@ -16,7 +22,7 @@ This method avoids the need for using the Kinesis .NET .dlls.
 def getDestination(serial):
 	dest = 0x50
 
-	serial.write(pack('<HBBBB', 0x0005, 0x00, 0x00, dest, 0x01))
+	serial.write(shortFrame(MGMSG_HW_REQ_INFO, 0x00, 0x00, dest))
 	rx = serial.read(90)
 	serial.flushInput()
 	serial.flushOutput()
@@ -31,18 +37,555 @@ def getAllDevices():
 	APT_devices = [port for port in ports if 'APT' in port[1]]
 	return 	APT_devices
 
+def getPortIdentity(port):
+
+	'''
+	Returns a key identifying the USB device behind a COM port (VID:PID:USB serial number:location).
+	Unlike the port name, it stays the same when the operating system renumbers the ports.
+	'''
+
+	return '{}:{}:{}:{}'.format(port.vid,port.pid,port.serial_number,port.location)
+
 def getHWinfo(serial,destination):
 
-	msg=pack('<HBBBB', 0x0005, 0x00, 0x00, destination, 0x01)
-	serial.write(msg)
+	info = requestHWinfo(serial,destination)
+	if info is None:
+		raise ReplyTimeoutError('No MGMSG_HW_GET_INFO reply from %s' % serial.port)
+
+	return (info.serialNumber,info.model,info.nChannels)
+
+def requestHWinfo(serial,destination,timeout=None):
+
+	'''
+	Sends a single MGMSG_HW_REQ_INFO and returns the typed HWInfo reply, or None if the device does not
+	answer within timeout seconds (REPLY_TIMEOUT by default). A reply means the destination byte is valid.
+	'''
+
+	serial.write(shortFrame(MGMSG_HW_REQ_INFO, 0x00, 0x00, destination))
+
+	#Read Back Data; any other frame in front of the MGMSG_HW_GET_INFO reply is skipped
+	decoder = APTFrameDecoder()
+	deadline = time.monotonic() + (REPLY_TIMEOUT if timeout is None else timeout)
+	while time.monotonic() < deadline:
+		decoder.readinto(serial)
+		for message in decoder.frames():
+			if message.msgid == MGMSG_HW_GET_INFO:
+				return message.data
+
+	return None
+
+
+#Seconds to wait for the reply of a request/response command (getPosition, get_status_Update, etc...)
+REPLY_TIMEOUT = 1.0
+
+#Default seconds allowed for homing and for a move to complete before MotionTimeoutError is raised
+HOME_TIMEOUT = 120.0
+MOVE_TIMEOUT = 60.0
+
+#MGMSG_MOT_ACK_DCSTATUSUPDATE must be sent at least once every 50 commands; it is scheduled after this many
+STAY_ALIVE_COMMANDS = 40
+
+#A single message received from a controller. For header only messages the parameters are held in
+#param1 and param2 and data is empty. For messages with a data packet, param1 and param2 are zero and
+#data is the typed reply registered in CODECS, or the raw bytes if the message has no typed reply.
+APTMessage = namedtuple('APTMessage',['msgid','param1','param2','dest','source','data'])
+
+#Typed data packets of the replies used by ThorController
+HWInfo = namedtuple('HWInfo',['serialNumber','model','hwType','firmwareVersion','notes','hwVersion','modState','nChannels'])
+PositionCounter = namedtuple('PositionCounter',['channel','position'])
+EncoderCounter = namedtuple('EncoderCounter',['channel','count'])
+DCStatus = namedtuple('DCStatus',['channel','position','velocity','reserved','statusBits'])
+StatusUpdate = namedtuple('StatusUpdate',['channel','position','encoderCount','statusBits'])
+VelocityParams = namedtuple('VelocityParams',['channel','minVelocity','acceleration','maxVelocity'])
+
+#Latest status of a channel in real units, with the time.monotonic() time it was received
+ChannelStatus = namedtuple('ChannelStatus',['position','velocity','statusBits','timestamp'])
+
+#Message IDs
+MGMSG_HW_REQ_INFO = 0x0005
+MGMSG_HW_GET_INFO = 0x0006
+MGMSG_HW_START_UPDATEMSGS = 0x0011
+MGMSG_HW_STOP_UPDATEMSGS = 0x0012
+MGMSG_HW_NO_FLASH_PROGRAMMING = 0x0018
+MGMSG_MOD_SET_CHANENABLESTATE = 0x0210
+MGMSG_MOD_IDENTIFY = 0x0223
+MGMSG_MOT_REQ_ENCCOUNTER = 0x040A
+MGMSG_MOT_GET_ENCCOUNTER = 0x040B
+MGMSG_MOT_REQ_POSCOUNTER = 0x0411
+MGMSG_MOT_GET_POSCOUNTER = 0x0412
+MGMSG_MOT_SET_VELPARAMS = 0x0413
+MGMSG_MOT_REQ_VELPARAMS = 0x0414
+MGMSG_MOT_GET_VELPARAMS = 0x0415
+MGMSG_MOT_MOVE_HOME = 0x0443
+MGMSG_MOT_MOVE_HOMED = 0x0444
+MGMSG_MOT_MOVE_ABSOLUTE = 0x0453
+MGMSG_MOT_MOVE_VELOCITY = 0x0457
+MGMSG_MOT_MOVE_COMPLETED = 0x0464
+MGMSG_MOT_MOVE_STOP = 0x0465
+MGMSG_MOT_MOVE_STOPPED = 0x0466
+MGMSG_MOT_GET_STATUSUPDATE = 0x0481
+MGMSG_MOT_REQ_DCSTATUSUPDATE = 0x0490
+MGMSG_MOT_GET_DCSTATUSUPDATE = 0x0491
+MGMSG_MOT_ACK_DCSTATUSUPDATE = 0x0492
+
+#DC servo status bits of MGMSG_MOT_GET_DCSTATUSUPDATE and the automatic status updates
+STATUS_MOVING_FORWARD = 0x00000010
+STATUS_MOVING_REVERSE = 0x00000020
+STATUS_HOMING = 0x00000200
+STATUS_HOMED = 0x00000400
+STATUS_ENABLED = 0x80000000
+
+#Header only frame: message ID, parameter 1, parameter 2, destination, source
+SHORT_HEADER = Struct('<HBBBB')
+#Header of a frame followed by a data packet: message ID, data length, destination|0x80, source
+HEADER = Struct('<HHBB')
+
+#Codec of a single message. data is the layout of the data packet (None for header only messages),
+#reply the typed namedtuple it decodes to and frame the layout of the whole frame used for encoding.
+APTCodec = namedtuple('APTCodec',['name','data','reply','frame'])
+
+CODECS = {}
+
+def registerMessage(msgid,name,dataFormat=None,reply=None):
+
+	'''
+	Adds a message to the codec table. dataFormat is the struct format of the data packet,
+	without it the message is a 6 byte header only message.
+	'''
+
+	if dataFormat is None:
+		CODECS[msgid] = APTCodec(name,None,reply,SHORT_HEADER)
+	else:
+		CODECS[msgid] = APTCodec(name,Struct(dataFormat),reply,Struct(HEADER.format + dataFormat.lstrip('<')))
+	return CODECS[msgid]
+
+registerMessage(MGMSG_HW_REQ_INFO,'MGMSG_HW_REQ_INFO')
+registerMessage(MGMSG_HW_GET_INFO,'MGMSG_HW_GET_INFO','<I8sHI48s12xHHH',HWInfo)
+registerMessage(MGMSG_HW_START_UPDATEMSGS,'MGMSG_HW_START_UPDATEMSGS')
+registerMessage(MGMSG_HW_STOP_UPDATEMSGS,'MGMSG_HW_STOP_UPDATEMSGS')
+registerMessage(MGMSG_HW_NO_FLASH_PROGRAMMING,'MGMSG_HW_NO_FLASH_PROGRAMMING')
+registerMessage(MGMSG_MOD_SET_CHANENABLESTATE,'MGMSG_MOD_SET_CHANENABLESTATE')
+registerMessage(MGMSG_MOD_IDENTIFY,'MGMSG_MOD_IDENTIFY')
+registerMessage(MGMSG_MOT_REQ_ENCCOUNTER,'MGMSG_MOT_REQ_ENCCOUNTER')
+registerMessage(MGMSG_MOT_GET_ENCCOUNTER,'MGMSG_MOT_GET_ENCCOUNTER','<Hi',EncoderCounter)
+registerMessage(MGMSG_MOT_REQ_POSCOUNTER,'MGMSG_MOT_REQ_POSCOUNTER')
+registerMessage(MGMSG_MOT_GET_POSCOUNTER,'MGMSG_MOT_GET_POSCOUNTER','<Hi',PositionCounter)
+registerMessage(MGMSG_MOT_SET_VELPARAMS,'MGMSG_MOT_SET_VELPARAMS','<Hiii')
+registerMessage(MGMSG_MOT_REQ_VELPARAMS,'MGMSG_MOT_REQ_VELPARAMS')
+registerMessage(MGMSG_MOT_GET_VELPARAMS,'MGMSG_MOT_GET_VELPARAMS','<Hiii',VelocityParams)
+registerMessage(MGMSG_MOT_MOVE_HOME,'MGMSG_MOT_MOVE_HOME')
+registerMessage(MGMSG_MOT_MOVE_HOMED,'MGMSG_MOT_MOVE_HOMED')
+registerMessage(MGMSG_MOT_MOVE_ABSOLUTE,'MGMSG_MOT_MOVE_ABSOLUTE','<Hi')
+registerMessage(MGMSG_MOT_MOVE_VELOCITY,'MGMSG_MOT_MOVE_VELOCITY')
+#Some controllers append a status packet to MOVE_COMPLETED and MOVE_STOPPED, so they are left without a fixed layout
+registerMessage(MGMSG_MOT_MOVE_COMPLETED,'MGMSG_MOT_MOVE_COMPLETED')
+registerMessage(MGMSG_MOT_MOVE_STOP,'MGMSG_MOT_MOVE_STOP')
+registerMessage(MGMSG_MOT_MOVE_STOPPED,'MGMSG_MOT_MOVE_STOPPED')
+registerMessage(MGMSG_MOT_GET_STATUSUPDATE,'MGMSG_MOT_GET_STATUSUPDATE','<HiiI',StatusUpdate)
+registerMessage(MGMSG_MOT_REQ_DCSTATUSUPDATE,'MGMSG_MOT_REQ_DCSTATUSUPDATE')
+registerMessage(MGMSG_MOT_GET_DCSTATUSUPDATE,'MGMSG_MOT_GET_DCSTATUSUPDATE','<HiHHI',DCStatus)
+registerMessage(MGMSG_MOT_ACK_DCSTATUSUPDATE,'MGMSG_MOT_ACK_DCSTATUSUPDATE')
+
+@lru_cache(maxsize=None)
+def shortFrame(msgid,param1,param2,dest,source=0x01):
+
+	'''
+	Returns the header only frame for a command. Frames are immutable, so each
+	(message, parameters, destination) combination is packed once and reused.
+	'''
+
+	return SHORT_HEADER.pack(msgid,param1,param2,dest,source)
+
+def encodeInto(buffer,msgid,dest,source,*fields):
+
+	'''
+	Packs a frame with a data packet into the reusable buffer with pack_into and
+	returns a memoryview of the encoded frame.
+	'''
+
+	codec = CODECS[msgid]
+	codec.frame.pack_into(buffer,0,msgid,codec.data.size,dest|0x80,source,*fields)
+	return memoryview(buffer)[:codec.frame.size]
+
+#Largest data packet accepted before a header is considered corrupt
+MAX_DATA_LENGTH = 255
+
+#Valid source bytes of frames sent to the host; cubes (0x50), benchtop motherboard (0x11) and bays (0x21-0x2A)
+SOURCES = frozenset([0x11,0x50] + list(range(0x21,0x2B)))
+
+class APTFrameDecoder:
+
+	'''
+	Incremental decoder for the stream of APT frames received from a controller.
+
+	Bytes are read straight into a preallocated ring buffer and frames are decoded in place with
+	Struct.unpack_from, so no buffers are allocated per frame. Only frames that wrap around the end of
+	the ring are copied, into a preallocated scratch buffer.
+
+	Every header is validated (host destination, known source, data length) and on a corrupt header the
+	decoder drops a single byte and resynchronises on the next valid header boundary.
+	'''
+
+	def __init__(self,size=4096):
+
+		self.size = size
+		self.ring = bytearray(size)
+		self.view = memoryview(self.ring)
+		self.scratch = bytearray(HEADER.size + MAX_DATA_LENGTH)
+		self.scratchView = memoryview(self.scratch)
+
+		#Index of the oldest unread byte and the number of unread bytes in the ring
+		self.head = 0
+		self.count = 0
+
+		#Number of bytes dropped while resynchronising
+		self.resyncs = 0
+
+	def readinto(self,Serial_Port):
+
+		'''
+		Reads the waiting bytes (or blocks for a single byte up to the port timeout) directly into the ring.
+		Returns the number of bytes read.
+		'''
+
+		tail = (self.head + self.count) % self.size
+		#Only the contiguous free space after the tail is filled per call
+		space = min(self.size - self.count, self.size - tail)
+		length = min(max(Serial_Port.in_waiting,1),space)
+
+		received = Serial_Port.readinto(self.view[tail:tail+length])
+		self.count += received
+		return received
+
+	def feed(self,data):
+
+		'''Copies bytes received from another source into the ring'''
+
+		data = memoryview(data)
+		while len(data):
+			if self.count == self.size:
+				raise BufferError('APT frame decoder ring buffer is full')
+			tail = (self.head + self.count) % self.size
+			length = min(len(data),self.size - self.count,self.size - tail)
+			self.view[tail:tail+length] = data[:length]
+			self.count += length
+			data = data[length:]
+		return
+
+	def contiguous(self,offset,length):
+
+		'''Returns (buffer, offset) holding length unread bytes starting at offset bytes past the head'''
+
+		start = (self.head + offset) % self.size
+		if start + length <= self.size:
+			return self.ring, start
+
+		first = self.size - start
+		self.scratchView[:first] = self.view[start:]
+		self.scratchView[first:length] = self.view[:length-first]
+		return self.scratch, 0
+
+	def consume(self,length):
+
+		self.head = (self.head + length) % self.size
+		self.count -= length
+		return
+
+	def frames(self):
+
+		'''Yields every complete frame in the ring as an APTMessage'''
+
+		while self.count >= HEADER.size:
+			buffer, offset = self.contiguous(0,HEADER.size)
+			msgid, param, dest, source = HEADER.unpack_from(buffer,offset)
+
+			hasData = dest & 0x80
+			codec = CODECS.get(msgid)
+
+			#Corrupt or misaligned header; drop one byte and look for the next header boundary
+			if (dest & 0x7F) != 0x01 or source not in SOURCES or (hasData and (param > MAX_DATA_LENGTH or
+				(codec is not None and codec.data is not None and param != codec.data.size))):
+				self.consume(1)
+				self.resyncs += 1
+				continue
+
+			if not hasData:
+				self.consume(HEADER.size)
+				yield APTMessage(msgid,param & 0xFF,param >> 8,dest,source,b'')
+				continue
+
+			if self.count < HEADER.size + param:
+				return
+
+			buffer, offset = self.contiguous(HEADER.size,param)
+			if codec is not None and codec.reply is not None:
+				data = codec.reply._make(codec.data.unpack_from(buffer,offset))
+			else:
+				data = bytes(buffer[offset:offset+param])
+			self.consume(HEADER.size + param)
+			yield APTMessage(msgid,0,0,dest & 0x7F,source,data)
+		return
+
+class MotionTimeoutError(TimeoutError):
+
+	'''Raised when homing or a move has not completed by its deadline'''
+
+class ReplyTimeoutError(TimeoutError):
+
+	'''Raised when a controller does not answer a request, such as MGMSG_HW_REQ_INFO, within REPLY_TIMEOUT'''
+
+class CompletionFuture(Future):
+
+	'''
+	Future resolved with the message a controller sends once an operation completes, such as
+	MGMSG_MOT_MOVE_HOMED or MGMSG_MOT_MOVE_COMPLETED.
+
+	The future carries a deadline (timeout seconds after it was created, or None for no deadline) that
+	wait(), wait_all() and wait_any() honour. Once a wait times out after the deadline has passed the future is
+	cancelled, so a late completion message is not left to resolve it. It can also be cancelled to stop waiting
+	for the operation, which wakes wait_all() and wait_any() straight away.
+
+	sent is the time.monotonic() the command was sent at. Until it is set, and for messages received before it,
+	the future is not resolved, so a completion left over from an earlier operation cannot complete it.
+	'''
+
+	def __init__(self,description,timeout=None):
+
+		Future.__init__(self)
+		self.description = description
+		self.deadline = None if timeout is None else time.monotonic() + timeout
+		self.sent = None
+		self.notifyLock = threading.Lock()
+		self.notified = False
+
+	def cancel(self):
+
+		'''
+		Cancels the future. Future.cancel() alone leaves concurrent.futures.wait() callers waiting until their
+		timeout, so waiters are notified here as the executor would do.
+		'''
+
+		with self.notifyLock:
+			if not Future.cancel(self):
+				return False
+			if not self.notified:
+				self.notified = True
+				Future.set_running_or_notify_cancel(self)
+		return True
+
+	def set_running_or_notify_cancel(self):
+
+		#Called by the reader before the result is set; a future cancel() has already notified is not notified again
+		with self.notifyLock:
+			if self.notified:
+				return False
+			self.notified = True
+			return Future.set_running_or_notify_cancel(self)
+
+	def expire(self):
+
+		'''Cancels the future if its deadline has passed. Returns True if the deadline has passed'''
+
+		if self.deadline is None or time.monotonic() < self.deadline:
+			return False
+		self.cancel()
+		return True
+
+	def remaining(self,timeout=None):
+
+		'''Returns the seconds left until the earlier of the deadline and timeout seconds from now'''
+
+		limits = [limit for limit in (self.deadline, None if timeout is None else time.monotonic() + timeout)
+			if limit is not None]
+		if not limits:
+			return None
+		return max(0.0,min(limits) - time.monotonic())
+
+	def wait(self,timeout=None):
+
+		'''
+		Waits for completion and returns the completion message. Raises MotionTimeoutError at the deadline, or
+		once timeout seconds have passed, and CancelledError if the future was cancelled.
+		'''
+
+		try:
+			return self.result(self.remaining(timeout))
+		#Only the same class as the builtin TimeoutError from Python 3.11
+		except FutureTimeoutError:
+			self.expire()
+			raise MotionTimeoutError('%s did not complete before its deadline' % self.description) from None
+
+def waitDeadline(futures,timeout):
+
+	#Earliest deadline (or timeout) of the futures still running; cancelled and completed futures do not count
+	remaining = [future.remaining(timeout) for future in futures if isinstance(future,CompletionFuture) and not future.done()]
+	remaining = [limit for limit in remaining if limit is not None]
+	return min(remaining) if remaining else timeout
+
+def wait_all(futures,timeout=None):
+
+	'''
+	Waits for every completion future and returns their messages in the same order.
+	Raises MotionTimeoutError naming the operations still running once the earliest deadline (or timeout) passes,
+	and CancelledError if one of the futures was cancelled, such as a move replaced by a later move.
+	'''
+
+	futures = list(futures)
+	done, notDone = waitFutures(futures,waitDeadline(futures,timeout))
+	if notDone:
+		for future in notDone:
+			if isinstance(future,CompletionFuture):
+				future.expire()
+		raise MotionTimeoutError('%s did not complete before the deadline' %
+			', '.join(getattr(future,'description',repr(future)) for future in futures if future in notDone))
+
+	return [future.result() for future in futures]
+
+def wait_any(futures,timeout=None):
+
+	'''
+	Waits for the first completion future to finish and returns it. A cancelled future counts as finished.
+	Raises MotionTimeoutError if none completes before the earliest deadline (or timeout).
+	'''
+
+	futures = list(futures)
+	done, notDone = waitFutures(futures,waitDeadline(futures,timeout),return_when=FIRST_COMPLETED)
+	if not done:
+		for future in notDone:
+			if isinstance(future,CompletionFuture):
+				future.expire()
+		raise MotionTimeoutError('None of %s completed before the deadline' %
+			', '.join(getattr(future,'description',repr(future)) for future in futures))
+
+	return [future for future in futures if future in done][0]
+
+
+class MessageReader(threading.Thread):
+
+	'''
+	Background thread that owns all reads from a controller's serial port.
+
+	Every received APT frame (6 byte header plus the optional data packet) is parsed into an APTMessage and
+	dispatched by message ID to:
+		- callbacks registered with subscribe(), which are called for every matching message
+		- futures returned by expect(), which are resolved by the next matching message only
+
+	Callbacks run on the reader thread and should return quickly.
+	'''
+
+	def __init__(self,Serial_Port):
+
+		threading.Thread.__init__(self,name='APT Reader %s' % Serial_Port.port)
+		self.daemon = True
+
+		self.Serial_Port = Serial_Port
+		self.subscribers = {}
+		self.pending = {}
+		self.lock = threading.Lock()
+		self.running = threading.Event()
+		self.decoder = APTFrameDecoder()
+
+	def subscribe(self,msgid,callback):
+
+		'''Calls callback(message) on the reader thread for every received message with the given ID'''
+
+		with self.lock:
+			self.subscribers.setdefault(msgid,[]).append(callback)
+		return
+
+	def unsubscribe(self,msgid,callback):
+
+		'''Removes a callback previously registered with subscribe()'''
+
+		with self.lock:
+			if callback in self.subscribers.get(msgid,[]):
+				self.subscribers[msgid].remove(callback)
+		return
+
+	def expect(self,msgid,source=None,future=None):
+
+		'''
+		Returns a Future resolved with the next received message of the given ID. If source is given only
+		a message from that source byte (channel) resolves it. An existing future, such as a
+		CompletionFuture, can be passed in to be resolved instead of a new one.
+
+		Must be called before the request command is written so the reply cannot be missed.
+		'''
+
+		if future is None:
+			future = Future()
+		with self.lock:
+			self.pending.setdefault(msgid,[]).append((source,future))
+
+		#Cancelled futures are dropped straight away instead of waiting for the next matching message
+		def dropCancelled(done):
+			if done.cancelled():
+				self.discard(msgid,done)
+		future.add_done_callback(dropCancelled)
+		return future
+
+	def discard(self,msgid,future):
+
+		with self.lock:
+			self.pending[msgid] = [entry for entry in self.pending.get(msgid,[]) if entry[1] is not future]
+		return
+
+	def stop(self):
+
+		'''Stops the reader thread and waits for it to exit'''
+
+		self.running.clear()
+		if self.is_alive() and threading.current_thread() is not self:
+			self.join()
+		return
+
+	def run(self):
+
+		self.running.set()
+		while self.running.is_set():
+			try:
+				#Blocks for at most the serial timeout, so stop() is honoured promptly
+				received = self.decoder.readinto(self.Serial_Port)
+			except (serial.SerialException,OSError,TypeError,AttributeError):
+				#Port was closed underneath the reader
+				break
 
-	#Read Back Data
-	header=bytearray(serial.read(6))
-	msgid, length, destOR, source = unpack('<HHBB', header)
-	data=bytearray(serial.read(length))
-	serialnum, model, hwtype, swversion, notes, hwversion, modstate, nchans = unpack('<I8sHI48s12xHHH', data)
+			if received:
+				receivedTime = time.monotonic()
+				for message in self.decoder.frames():
+					self.dispatch(message,receivedTime)
+
+		self.running.clear()
+		return
+
+	def dispatch(self,message,receivedTime=None):
+
+		with self.lock:
+			callbacks = list(self.subscribers.get(message.msgid,()))
+			#A message resolves only the oldest future waiting for it, so one MGMSG_MOT_MOVE_COMPLETED completes
+			#one move and a newer move on the same channel keeps waiting for its own
+			entries = self.pending.get(message.msgid,[])
+			future = None
+			for index, (source, waiting) in enumerate(entries):
+				if isinstance(waiting,CompletionFuture) and (waiting.sent is None or
+					(receivedTime is not None and receivedTime < waiting.sent)):
+					#Received before the command was sent, so it completes an earlier operation
+					continue
+				if source is None or source == message.source:
+					future = waiting
+					del entries[index]
+					break
+
+		if future is not None and future.set_running_or_notify_cancel():
+			future.set_result(message)
+
+		for callback in callbacks:
+			try:
+				callback(message)
+			except Exception as error:
+				print("Reader Error: callback for message 0x%04X failed: %s" % (message.msgid,error))
+		return
 
-	return (serialnum,model,nchans)
 
 class ThorController:
 
@@ -98,12 +641,36 @@ class ThorController:
 		#self.channel = channel
 		#self.channel_byte = 0x01
 		self.source_byte = 0x01
+		#Reusable buffer that frames with a data packet are encoded into
+		self.txBuffer = bytearray(HEADER.size + MAX_DATA_LENGTH)
+
+		#Outbound command queue, written with one write() per Flush_Commands()
+		self.txQueue = bytearray()
+		self.txLock = threading.Lock()
+		#Commands sent and time of the last Stay_Alive per destination byte
+		self.commandCounts = {}
+		self.lastStayAlive = {}
+		#Optional maximum number of seconds between Stay_Alive messages, on top of the command count
+		self.Stay_Alive_Period = None
+
+		#CompletionFuture of the move still running per destination byte
+		self.pendingMoves = {}
+
+		#Latest ChannelStatus per channel, replaced whole by the reader thread so reads need no lock
+		self.latestStatus = {}
+		#Status messages received per channel since the last Stay_Alive
+		self.statusCounts = {}
+		self.streaming = False
 		try:
 			#Create Serial Object for the controller to communicate to the declared Com Port	
 			self.Serial_Port = serial.Serial(port = self.port, baudrate = 115200, bytesize=8,
 				parity=serial.PARITY_NONE, stopbits=1,timeout=0.1)
 		except:
 			print("Port Error: Unable to connect to '%s'. Device may already be in use." % self.port)
+		else:
+			#All reads go through the reader thread which dispatches received messages by ID
+			self.Reader = MessageReader(self.Serial_Port)
+			self.Reader.start()
 
 
 	def get_destination_byte(self,channel_num):
@@ -134,14 +701,13 @@ class ThorController:
 		#Initialize the motors so they can send confirmation Rx commands for when they complete moves
 		#Some K-Cubes and T-Cubes require calling the GetHWInfo Command to allow Rx confirmation calls
 		#This does not negatively impact if it's a benchtop controller in any way
-		self.Serial_Port.write(pack('<HBBBB', 0x0005, 0x00, 0x00, self.get_destination_byte(channel_num), self.source_byte))
-		self.Serial_Port.reset_input_buffer()
-		self.Serial_Port.reset_output_buffer()
+		self.Send(shortFrame(MGMSG_HW_REQ_INFO,0x00,0x00,self.get_destination_byte(channel_num),self.source_byte),channel_num)
+		self.Flush_Buffers()
 
 		#Benchtop Controllers require the MGMSG_HW_NO_FLASH_PROGRAMMING to allow confirmation Rx
 		#This should not negatively impact a T Cube/K Cube in any way
 		#MGMSG_HW_NO_FLASH_PROGRAMMING
-		self.Serial_Port.write(pack('<HBBBB', 0x0018, 0x00, 0x00, self.get_destination_byte(channel_num), self.source_byte))
+		self.Send(shortFrame(MGMSG_HW_NO_FLASH_PROGRAMMING,0x00,0x00,self.get_destination_byte(channel_num),self.source_byte),channel_num)
 
 		self.Flush_Buffers()
 
@@ -153,6 +719,7 @@ class ThorController:
 		
 		''' Closes the serial port from communication'''
 
+		self.Reader.stop()
 		self.Serial_Port.close()
 		return
 
@@ -161,14 +728,24 @@ class ThorController:
 		''' Opens the serial port from communication if closed'''
 
 		self.Serial_Port.open()
+		if not self.Reader.is_alive():
+			self.Reader = MessageReader(self.Serial_Port)
+			self.Reader.start()
 		return
 
 	def Flush_Buffers(self):
 
-		'''Clears the serial objects input/output buffers'''
+		'''
+		Clears the serial objects input/output buffers while the reader thread is not running.
+
+		The input buffer is owned by the reader thread, so unsolicited status messages are dispatched instead
+		of thrown away. The output buffer is not cleared either: commands are always written whole by
+		Flush_Commands(), so it only ever holds commands the controller has not received yet.
+		'''
 
-		self.Serial_Port.reset_input_buffer()
-		self.Serial_Port.reset_output_buffer()
+		if not self.Reader.is_alive():
+			self.Serial_Port.reset_input_buffer()
+			self.Serial_Port.reset_output_buffer()
 
 		return	
 		
@@ -181,22 +758,72 @@ class ThorController:
 		'''
 		if self.Controller_Type == 'cube':
 			#MGMSG_MOD_IDENTIFY
-			self.Serial_Port.write(pack('<HBBBB',0x0223,0x01, 0x00, 0x50, self.source_byte)) 
+			self.Send(shortFrame(MGMSG_MOD_IDENTIFY,0x01,0x00,0x50,self.source_byte),channel_num) 
 		elif self.Controller_Type == 'benchtop':
 			#MGMSG_MOD_IDENTIFY
-			self.Serial_Port.write(pack('<HBBBB',0x0223,channel_num, 0x00, 0x11, self.source_byte))
+			self.Send(shortFrame(MGMSG_MOD_IDENTIFY,channel_num,0x00,0x11,self.source_byte),channel_num)
 
-		self.Stay_Alive(channel_num)
 		self.Flush_Buffers()
 		return			
 
 	def Stay_Alive(self,channel_num):
 
-		''' Must be sent at least once every 50 commands to keep the connection alive'''
+		'''
+		Must be sent at least once every 50 commands to keep the connection alive.
+
+		Commands sent through Send() schedule this automatically, so it only needs to be called directly
+		to force a keep-alive out immediately.
+		'''
+
+		dest = self.get_destination_byte(channel_num)
 
 		#MGMSG_MOT_ACK_DCSTATUSUPDATE
 		#Must be sent every 50 Tx commands if polling, otherwise polling will stop
-		self.Serial_Port.write(pack('<HBBBB',0x0492,0x00,0x00,self.get_destination_byte(channel_num),self.source_byte))
+		with self.txLock:
+			self.txQueue += shortFrame(MGMSG_MOT_ACK_DCSTATUSUPDATE,0x00,0x00,dest,self.source_byte)
+			self.commandCounts[dest] = 0
+			self.lastStayAlive[dest] = time.monotonic()
+		self.Flush_Commands()
+
+		return
+
+	def Send(self,frame,channel_num,flush=True):
+
+		'''
+		Queues a command frame for the channel. Unless flush is False the queue is written straight away,
+		otherwise it is written with the next Flush_Commands() so several commands share one write().
+		'''
+
+		dest = self.get_destination_byte(channel_num)
+		with self.txLock:
+			self.txQueue += frame
+			self.commandCounts[dest] = self.commandCounts.get(dest,0) + 1
+
+		if flush:
+			self.Flush_Commands()
+		return
+
+	def Flush_Commands(self):
+
+		'''
+		Writes every queued command with a single write().
+
+		A Stay_Alive is appended for each destination that has been sent STAY_ALIVE_COMMANDS commands since
+		its last one, or, if Stay_Alive_Period is set, has not had one for that many seconds.
+		'''
+
+		now = time.monotonic()
+		with self.txLock:
+			for dest, count in self.commandCounts.items():
+				if count >= STAY_ALIVE_COMMANDS or (self.Stay_Alive_Period is not None and
+					now - self.lastStayAlive.get(dest,0) >= self.Stay_Alive_Period):
+					self.txQueue += shortFrame(MGMSG_MOT_ACK_DCSTATUSUPDATE,0x00,0x00,dest,self.source_byte)
+					self.commandCounts[dest] = 0
+					self.lastStayAlive[dest] = now
+
+			if self.txQueue:
+				self.Serial_Port.write(self.txQueue)
+				del self.txQueue[:]
 
 		return
 
@@ -215,19 +842,17 @@ class ThorController:
 
 		#Enable Stage; MGMSG_MOD_SET_CHANENABLESTATE 
 		Enable = 0x01
-		self.Serial_Port.write(pack('<HBBBB',0x0210,0x01,Enable,self.get_destination_byte(channel_num),self.source_byte))
+		self.Send(shortFrame(MGMSG_MOD_SET_CHANENABLESTATE,0x01,Enable,self.get_destination_byte(channel_num),self.source_byte),channel_num)
 		time.sleep(0.1)
 
 		self.Flush_Buffers()		
-		self.Stay_Alive(channel_num)
 
 		if self.Controller_Type == 'benchtop':
 			
-			self.Serial_Port.write(pack('<HBBBB',0x0210,0x01,Enable,self.get_destination_byte(channel_num),self.source_byte))
+			self.Send(shortFrame(MGMSG_MOD_SET_CHANENABLESTATE,0x01,Enable,self.get_destination_byte(channel_num),self.source_byte),channel_num)
 			time.sleep(0.1)
 
 			self.Flush_Buffers()		
-			self.Stay_Alive(channel_num)
 		
 
 
@@ -247,22 +872,20 @@ class ThorController:
 
 		#Disable Stage; MGMSG_MOD_SET_CHANENABLESTATE 
 		Disable = 0x02
-		self.Serial_Port.write(pack('<HBBBB',0x0210,channel_num,Disable,self.get_destination_byte(channel_num),self.source_byte))
+		self.Send(shortFrame(MGMSG_MOD_SET_CHANENABLESTATE,channel_num,Disable,self.get_destination_byte(channel_num),self.source_byte),channel_num)
 		time.sleep(0.1)
 		self.Flush_Buffers()		
-		self.Stay_Alive(channel_num)
 
 		if self.Controller_Type == 'benchtop':
 			
-			self.Serial_Port.write(pack('<HBBBB',0x0210,0x01,Disable,self.get_destination_byte(channel_num),self.source_byte))
+			self.Send(shortFrame(MGMSG_MOD_SET_CHANENABLESTATE,0x01,Disable,self.get_destination_byte(channel_num),self.source_byte),channel_num)
 			time.sleep(0.1)
 
 			self.Flush_Buffers()		
-			self.Stay_Alive(channel_num)
 
 		return
 
-	def Home(self,channel_num,wait=True):
+	def Home(self,channel_num,wait=True,timeout=HOME_TIMEOUT):
 
 
 
@@ -271,29 +894,30 @@ class ThorController:
 		If wait is defined as False in the input arguement, the method will return and
 		advance in the program immediately after homing has initiated
 
+		Returns a CompletionFuture that is resolved with the MGMSG_MOT_MOVE_HOMED message once homing completes.
+		Homing must complete within timeout seconds (None for no deadline), otherwise waiting raises MotionTimeoutError
+
 		'''
 
+		#MGMSG_MOT_MOVE_HOMED from this channel; registered before sending so the reply cannot be missed
+		homed = CompletionFuture('Homing %s channel %d' % (self.port,channel_num),timeout)
+		self.Reader.expect(MGMSG_MOT_MOVE_HOMED,self.get_destination_byte(channel_num),homed)
+
 		#Home Stage; MGMSG_MOT_MOVE_HOME 
-		self.Serial_Port.write(pack('<HBBBB',0x0443,0x01,0x00,self.get_destination_byte(channel_num),self.source_byte))
+		homed.sent = time.monotonic()
+		self.Send(shortFrame(MGMSG_MOT_MOVE_HOME,0x01,0x00,self.get_destination_byte(channel_num),self.source_byte),channel_num)
 		
 		#wait is default true and won't return until finished homing
 		#If wait is false, it will advance before homing has completed
 		if wait:
-			Rx = ''
-
-			#MGMSG_MOT_MOVE_HOMED  
-			Homed = pack('<H',0x0444)
-			while Rx != Homed:
-				Rx = self.Serial_Port.read(2)
-
+			homed.wait()
 
 		self.Flush_Buffers()		
-		self.Stay_Alive(channel_num)
 
-		return	
+		return homed
 
 
-	def Move_Absolute(self,Position,channel_num,wait=True):
+	def Move_Absolute(self,Position,channel_num,wait=True,flush=True,timeout=MOVE_TIMEOUT):
 
 		'''
 		Move stage to absolute postion of real unit arguement 'Position'. 
@@ -301,28 +925,135 @@ class ThorController:
 
 		If False is provided for wait as an additional input argument, the method returns immediately after
 		 the movehas started
+
+		If False is provided for flush (and wait is False) the command is only queued and is written with the
+		 next Flush_Commands() call, together with any other queued commands
+
+		Returns a CompletionFuture that is resolved with the MGMSG_MOT_MOVE_COMPLETED message once the move completes.
+		The move must complete within timeout seconds (None for no deadline), otherwise waiting raises MotionTimeoutError
+
+		A new move replaces a move of the channel that is still running, and the controller only reports the
+		completion of the new one, so the CompletionFuture of the replaced move is cancelled.
 		'''
 
 		#Convert real unit position to device unit position
 		dUnitpos = int(self.posScaleFactor*Position)
+		dest = self.get_destination_byte(channel_num)
 
-		#MGMSG_MOT_MOVE_ABSOLUTE 
-		self.Serial_Port.write(pack('<HBBBBHI',0x0453,0x06,0x00,self.get_destination_byte(channel_num)|0x80,self.source_byte, 
-			0x01,dUnitpos))
+		#Cancelling also removes the replaced move's future from the reader
+		replaced = self.pendingMoves.get(dest)
+		if replaced is not None:
+			replaced.cancel()
 
-		if wait:
-			Rx = ''
+		#MGMSG_MOT_MOVE_COMPLETED from this channel; registered before sending so the reply cannot be missed
+		moveComplete = CompletionFuture('Move of %s channel %d to %s' % (self.port,channel_num,Position),timeout)
+		self.Reader.expect(MGMSG_MOT_MOVE_COMPLETED,dest,moveComplete)
+		self.pendingMoves[dest] = moveComplete
 
-			#MGMSG_MOT_MOVE_COMPLETED
-			Move_Complete = pack('<H',0x0464)
-			while Rx != Move_Complete:
-				Rx = self.Serial_Port.read(2)
+		#MGMSG_MOT_MOVE_ABSOLUTE; encoded into the controller's reusable transmit buffer
+		moveComplete.sent = time.monotonic()
+		self.Send(encodeInto(self.txBuffer,MGMSG_MOT_MOVE_ABSOLUTE,dest,
+			self.source_byte,0x01,dUnitpos),channel_num,flush = flush or wait)
 
+		if wait:
+			moveComplete.wait()
 		
 		self.Flush_Buffers()		
-		self.Stay_Alive(channel_num)
 
-		return				
+		return moveComplete
+
+	def Set_Velocity_Params(self,Velocity,Acceleration,channel_num,flush=True):
+
+		'''
+		MGMSG_MOT_SET_VELPARAMS 0x0413
+
+		Sets the maximum velocity and the acceleration, in real units, of the channel's move profile.
+		They are used by absolute moves as well as velocity moves.
+		'''
+
+		self.Send(encodeInto(self.txBuffer,MGMSG_MOT_SET_VELPARAMS,self.get_destination_byte(channel_num),self.source_byte,
+			0x01,0,int(self.accScaleFactor*Acceleration),int(self.velScaleFactor*Velocity)),channel_num,flush = flush)
+		return
+
+	def Get_Velocity_Params(self,channel_num):
+
+		'''
+		MGMSG_MOT_REQ_VELPARAMS 0x0414
+
+		Returns the real unit maximum velocity and acceleration of the channel's move profile
+		'''
+
+		#MGMSG_MOT_GET_VELPARAMS
+		params = self.Request_Reply(MGMSG_MOT_REQ_VELPARAMS,MGMSG_MOT_GET_VELPARAMS,channel_num).data
+
+		return (params.maxVelocity/self.velScaleFactor), (params.acceleration/self.accScaleFactor)
+
+	def Move_Velocity(self,Velocity,Acceleration,channel_num,flush=True):
+
+		'''
+		MGMSG_MOT_MOVE_VELOCITY 0x0457
+
+		Moves the stage continuously at the real unit Velocity; positive is forward and negative reverse.
+		The stage keeps moving until another move or Stop() is sent, so calling this again while moving
+		changes the speed without stopping. A Velocity of zero stops the stage with a profiled stop.
+
+		The velocity parameters and the move are queued together and written with a single write().
+		Note that the velocity parameters stay in effect for later absolute moves.
+		'''
+
+		if Velocity == 0:
+			self.Stop(channel_num,wait=False)
+			return
+
+		#Direction; 0x01 forward, 0x02 reverse
+		direction = 0x01 if Velocity > 0 else 0x02
+		self.Set_Velocity_Params(abs(Velocity),Acceleration,channel_num,flush=False)
+		self.Send(shortFrame(MGMSG_MOT_MOVE_VELOCITY,0x01,direction,self.get_destination_byte(channel_num),self.source_byte),
+			channel_num,flush = flush)
+		return
+
+	def Stop(self,channel_num,immediate=False,wait=True,timeout=MOVE_TIMEOUT):
+
+		'''
+		MGMSG_MOT_MOVE_STOP 0x0465
+
+		Stops any move of the channel, decelerating along the move profile unless immediate is True.
+
+		Returns a CompletionFuture that is resolved with the MGMSG_MOT_MOVE_STOPPED message once the stage has stopped.
+		As a default the method waits for it, if wait is False it returns as soon as the command is sent.
+		'''
+
+		#MGMSG_MOT_MOVE_STOPPED from this channel; registered before sending so the reply cannot be missed
+		stopped = CompletionFuture('Stop of %s channel %d' % (self.port,channel_num),timeout)
+		self.Reader.expect(MGMSG_MOT_MOVE_STOPPED,self.get_destination_byte(channel_num),stopped)
+
+		#Stop mode; 0x01 immediate, 0x02 profiled
+		stopMode = 0x01 if immediate else 0x02
+		stopped.sent = time.monotonic()
+		self.Send(shortFrame(MGMSG_MOT_MOVE_STOP,0x01,stopMode,self.get_destination_byte(channel_num),self.source_byte),channel_num)
+
+		if wait:
+			stopped.wait()
+
+		return stopped
+
+	def Request_Reply(self,msgid,replyid,channel_num):
+
+		'''
+		Sends the request msgid to the channel and returns the replyid message the channel answers with.
+		Only a reply from the channel's own destination byte is accepted, otherwise ReplyTimeoutError is raised.
+		'''
+
+		dest = self.get_destination_byte(channel_num)
+		reply = self.Reader.expect(replyid,dest)
+		try:
+			self.Send(shortFrame(msgid,0x01,0x00,dest,self.source_byte),channel_num)
+			return reply.result(REPLY_TIMEOUT)
+		except FutureTimeoutError:
+			raise ReplyTimeoutError('No reply 0x%04X from %s channel %d' % (replyid,self.port,channel_num)) from None
+		finally:
+			#Drops the future if no reply arrived, so it is not left pending
+			reply.cancel()
 
 	#differnt methods for returning position
 	def getPosition(self,channel_num):
@@ -332,12 +1063,9 @@ class ThorController:
 
 		'''
 
-		self.Flush_Buffers()	
-		#MGMSG_MOT_REQ_POSCOUNTER 
-		self.Serial_Port.write(pack('<HBBBB',0x0411,0x01,0x00,self.get_destination_byte(channel_num),self.source_byte))
-		header, chan_dent, position_dUnits = unpack('<6sHI',self.Serial_Port.read(12))
+		#MGMSG_MOT_REQ_POSCOUNTER, answered with MGMSG_MOT_GET_POSCOUNTER
+		position_dUnits = self.Request_Reply(MGMSG_MOT_REQ_POSCOUNTER,MGMSG_MOT_GET_POSCOUNTER,channel_num).data.position
 
-		self.Stay_Alive(channel_num)		
 		self.Flush_Buffers()	
 		
 		return position_dUnits/float(self.posScaleFactor)	
@@ -353,15 +1081,28 @@ class ThorController:
 		function return the positiona and velocity in real units
 
 		'''
+		#MGMSG_MOT_GET_DCSTATUSUPDATE
+		status = self.Request_Reply(MGMSG_MOT_REQ_DCSTATUSUPDATE,MGMSG_MOT_GET_DCSTATUSUPDATE,channel_num).data
+		positionDU, velocityDU = status.position, status.velocity
 		self.Flush_Buffers()
-		self.Serial_Port.write(pack('<HBBBB',0x0490,0x01,0x00,self.get_destination_byte(channel_num),self.source_byte))
-		msg = self.Serial_Port.read(20)
-		unused, positionDU,velocityDU, reserved, status_bits = unpack('<8sIHHI',msg)
-		self.Flush_Buffers()
-		self.Stay_Alive(channel_num)	
 
 		return (positionDU/self.posScaleFactor), (velocityDU/204.8)#/self.velScaleFactor	
 
+	def Request_Status(self,channel_num,flush=True):
+
+		'''
+		MGMSG_MOT_REQ_DCSTATUSUPDATE 0x0490 without waiting for the reply
+
+		Returns a Future resolved with the MGMSG_MOT_GET_DCSTATUSUPDATE message from the channel. If False is
+		provided for flush the request is only queued, so it can share a single write() with other commands
+		such as a move
+		'''
+
+		reply = self.Reader.expect(MGMSG_MOT_GET_DCSTATUSUPDATE,self.get_destination_byte(channel_num))
+		self.Send(shortFrame(MGMSG_MOT_REQ_DCSTATUSUPDATE,0x01,0x00,self.get_destination_byte(channel_num),self.source_byte),
+			channel_num,flush = flush)
+		return reply
+
 	def getEncCounter(self,channel_num):
 
 		'''
@@ -371,12 +1112,88 @@ class ThorController:
 
 		'''
 
-		self.Flush_Buffers()	
-		#MGMSG_MOT_REQ_POSCOUNTER 
-		self.Serial_Port.write(pack('<HBBBB',0x040A,0x01,0x00,self.get_destination_byte(channel_num),self.source_byte))
-		header, chan_dent, EncCount = unpack('<6sHI',self.Serial_Port.read(12))
+		#MGMSG_MOT_REQ_ENCCOUNTER, answered with MGMSG_MOT_GET_ENCCOUNTER
+		EncCount = self.Request_Reply(MGMSG_MOT_REQ_ENCCOUNTER,MGMSG_MOT_GET_ENCCOUNTER,channel_num).data.count
 
-		self.Stay_Alive(channel_num)		
 		self.Flush_Buffers()	
 		
-		return EncCount/float(self.posScaleFactor)									
+		return EncCount/float(self.posScaleFactor)
+
+	def Start_Update_Messages(self,channel_num=1):
+
+		'''
+		MGMSG_HW_START_UPDATEMSGS 0x0011
+
+		Starts the controller's automatic status update messages (MGMSG_MOT_GET_DCSTATUSUPDATE for DC servo
+		controllers, MGMSG_MOT_GET_STATUSUPDATE for stepper controllers). The reader thread keeps the latest
+		status of each channel, which Latest_Status() and Latest_Position() return without any serial I/O.
+
+		The controller stops sending updates if it does not receive a Stay_Alive every 50 updates, so one is
+		sent automatically every STAY_ALIVE_COMMANDS received updates.
+		'''
+
+		if not self.streaming:
+			self.Reader.subscribe(MGMSG_MOT_GET_DCSTATUSUPDATE,self.Update_Status)
+			self.Reader.subscribe(MGMSG_MOT_GET_STATUSUPDATE,self.Update_Status)
+			self.streaming = True
+
+		self.Send(shortFrame(MGMSG_HW_START_UPDATEMSGS,0x00,0x00,self.get_destination_byte(channel_num),self.source_byte),channel_num)
+		return
+
+	def Stop_Update_Messages(self,channel_num=1):
+
+		'''
+		MGMSG_HW_STOP_UPDATEMSGS 0x0012
+
+		Stops the automatic status update messages. The last received status remains available.
+		'''
+
+		self.Send(shortFrame(MGMSG_HW_STOP_UPDATEMSGS,0x00,0x00,self.get_destination_byte(channel_num),self.source_byte),channel_num)
+
+		if self.streaming:
+			self.Reader.unsubscribe(MGMSG_MOT_GET_DCSTATUSUPDATE,self.Update_Status)
+			self.Reader.unsubscribe(MGMSG_MOT_GET_STATUSUPDATE,self.Update_Status)
+			self.streaming = False
+		return
+
+	def Update_Status(self,message):
+
+		'''Reader thread callback storing a received status update as the channel's latest status'''
+
+		status = message.data
+		if self.Controller_Type == 'benchtop':
+			channel_num = message.source - 0x20
+		else:
+			channel_num = status.channel
+
+		if message.msgid == MGMSG_MOT_GET_DCSTATUSUPDATE:
+			velocity = status.velocity/204.8
+		else:
+			velocity = 0.0
+
+		self.latestStatus[channel_num] = ChannelStatus(status.position/float(self.posScaleFactor),velocity,
+			status.statusBits,time.monotonic())
+
+		self.statusCounts[channel_num] = self.statusCounts.get(channel_num,0) + 1
+		if self.statusCounts[channel_num] >= STAY_ALIVE_COMMANDS:
+			self.statusCounts[channel_num] = 0
+			self.Stay_Alive(channel_num)
+		return
+
+	def Latest_Status(self,channel_num=1):
+
+		'''
+		Returns the latest ChannelStatus (position, velocity, status bits, time.monotonic() timestamp) received
+		from the automatic status updates, or None if no update has been received yet.
+		'''
+
+		return self.latestStatus.get(channel_num)
+
+	def Latest_Position(self,channel_num=1):
+
+		'''Returns the real unit position from the latest automatic status update, or None'''
+
+		status = self.latestStatus.get(channel_num)
+		if status is None:
+			return None
+		return status.position
@@ -0,0 +1,274 @@
+import io
+import os
+import sys
+import time
+import contextlib
+import trackingChannel
+from tickScheduler import TickScheduler
+from trackingChannel import TrackingChannel, TrackingParams, DEFAULT_PARAMS, SEQUENCE
+from pyKinesis import (APTFrameDecoder,CODECS,HEADER,MAX_DATA_LENGTH,shortFrame,encodeInto,MGMSG_HW_GET_INFO,
+	MGMSG_MOT_GET_POSCOUNTER,MGMSG_MOT_GET_ENCCOUNTER,MGMSG_MOT_GET_VELPARAMS,MGMSG_MOT_GET_STATUSUPDATE,
+	MGMSG_MOT_GET_DCSTATUSUPDATE,MGMSG_MOT_SET_VELPARAMS,MGMSG_MOT_MOVE_ABSOLUTE,MGMSG_MOT_MOVE_COMPLETED,
+	MGMSG_MOT_MOVE_HOMED)
+
+'''
+Scripted checks of the parts of the tracking software that can go wrong without any hardware attached.
+
+Every check runs in a fraction of a second without a controller or a simulated K-Cube (the tracking channel
+checks create a small shared memory block of their own), and the script exits non-zero if any of them fails:
+
+	python selfTest.py
+'''
+
+#Host and K-Cube bytes of frames sent to the host
+HOST = 0x01
+CUBE = 0x50
+
+#Fields of every typed reply and of the commands with a data packet
+CODEC_SAMPLES = {
+	MGMSG_HW_GET_INFO: (27000000,b'KDC101\x00\x00',16,0x00030001,b'Simulated KDC101'.ljust(48,b'\x00'),1,0,1),
+	MGMSG_MOT_GET_POSCOUNTER: (1,-1919642),
+	MGMSG_MOT_GET_ENCCOUNTER: (1,2147483647),
+	MGMSG_MOT_GET_VELPARAMS: (1,0,4506,43980465),
+	MGMSG_MOT_GET_STATUSUPDATE: (1,-100,100,0x80000400),
+	MGMSG_MOT_GET_DCSTATUSUPDATE: (1,345600,2048,0,0x80000410),
+	MGMSG_MOT_SET_VELPARAMS: (1,0,146,429416),
+	MGMSG_MOT_MOVE_ABSOLUTE: (1,-2147483648)}
+
+
+def expect(condition,description):
+
+	if not condition:
+		raise AssertionError(description)
+	return
+
+def statusFrame(position=1000):
+
+	codec = CODECS[MGMSG_MOT_GET_DCSTATUSUPDATE]
+	return codec.frame.pack(MGMSG_MOT_GET_DCSTATUSUPDATE,codec.data.size,HOST|0x80,CUBE,1,position,0,0,0)
+
+def decode(decoder,data):
+
+	decoder.feed(data)
+	return list(decoder.frames())
+
+def checkDecoderGarbage():
+
+	#Bytes that are not a frame are skipped one at a time until the next valid header
+	decoder = APTFrameDecoder()
+	messages = decode(decoder,b'\xff\x00\x13\x37\x01' + statusFrame(42) + b'\x80' + shortFrame(MGMSG_MOT_MOVE_HOMED,1,0,HOST,CUBE))
+	expect([message.msgid for message in messages] == [MGMSG_MOT_GET_DCSTATUSUPDATE,MGMSG_MOT_MOVE_HOMED],
+		'expected the status and homed frames, got {}'.format(messages))
+	expect(messages[0].data.position == 42,'status frame decoded from the wrong offset')
+	expect(decoder.resyncs == 6,'expected 6 bytes dropped, {} were'.format(decoder.resyncs))
+	expect(decoder.count == 0,'{} bytes left over'.format(decoder.count))
+	return
+
+def checkDecoderCorruptLength():
+
+	#A header with a data length longer than any message, or not that of its message, is not waited for
+	decoder = APTFrameDecoder()
+	corrupt = HEADER.pack(MGMSG_MOT_GET_DCSTATUSUPDATE,MAX_DATA_LENGTH + 1,HOST|0x80,CUBE)
+	mismatched = HEADER.pack(MGMSG_MOT_GET_POSCOUNTER,40,HOST|0x80,CUBE)
+	messages = decode(decoder,corrupt + mismatched + statusFrame(7))
+	expect(len(messages) == 1 and messages[0].data.position == 7,'expected only the valid frame, got {}'.format(messages))
+	return
+
+def checkDecoderPartialFrames():
+
+	#A frame arriving a byte at a time is only decoded once it is complete, and a frame split across two reads
+	#is decoded with the next read
+	decoder = APTFrameDecoder()
+	frame = statusFrame(-5)
+	for index in range(len(frame) - 1):
+		expect(decode(decoder,frame[index:index + 1]) == [],'frame decoded after {} of {} bytes'.format(index + 1,len(frame)))
+	messages = decode(decoder,frame[-1:])
+	expect(len(messages) == 1 and messages[0].data.position == -5,'complete frame not decoded')
+
+	messages = decode(decoder,frame + frame[:10])
+	expect(len(messages) == 1 and decoder.count == 10,'expected one frame and 10 bytes waiting')
+	messages = decode(decoder,frame[10:])
+	expect(len(messages) == 1 and messages[0].data.position == -5,'split frame not decoded')
+	expect(decoder.resyncs == 0,'valid frames were resynchronised')
+	return
+
+def checkDecoderWrapAround():
+
+	#Frames that wrap around the end of the ring are decoded through the scratch buffer
+	decoder = APTFrameDecoder(size=64)
+	for position in range(100):
+		messages = decode(decoder,statusFrame(position))
+		expect(len(messages) == 1 and messages[0].data.position == position,
+			'frame {} not decoded across the ring boundary'.format(position))
+	return
+
+def checkCodecRoundTrips():
+
+	#Every message with a data packet decodes to the fields it was encoded from
+	buffer = bytearray(HEADER.size + MAX_DATA_LENGTH)
+	for msgid, fields in CODEC_SAMPLES.items():
+		codec = CODECS[msgid]
+		messages = decode(APTFrameDecoder(),encodeInto(buffer,msgid,HOST,CUBE,*fields))
+		expect(len(messages) == 1,'{} not decoded'.format(codec.name))
+		message = messages[0]
+		expect((message.msgid,message.dest,message.source) == (msgid,HOST,CUBE),'{} header changed'.format(codec.name))
+		data = message.data if codec.reply is not None else codec.data.unpack(message.data)
+		expect(tuple(data) == fields,'{} decoded to {}, not {}'.format(codec.name,tuple(data),fields))
+		if codec.reply is not None:
+			expect(isinstance(data,codec.reply),'{} not decoded to {}'.format(codec.name,codec.reply.__name__))
+
+	#Header only messages keep their two parameters
+	message = decode(APTFrameDecoder(),shortFrame(MGMSG_MOT_MOVE_COMPLETED,0x01,0x02,HOST,0x21))[0]
+	expect((message.msgid,message.param1,message.param2,message.source) == (MGMSG_MOT_MOVE_COMPLETED,0x01,0x02,0x21),
+		'header only message decoded to {}'.format(message))
+	return
+
+class InterruptedParams:
+
+	'''Stands in for trackingChannel.PARAMS; the GUI writes new parameters while the first read is under way'''
+
+	def __init__(self,writer,params):
+
+		self.struct = trackingChannel.PARAMS
+		self.size = self.struct.size
+		self.writer = writer
+		self.params = params
+		self.reads = 0
+
+	def pack_into(self,*args):
+
+		return self.struct.pack_into(*args)
+
+	def unpack_from(self,buffer,offset=0):
+
+		values = self.struct.unpack_from(buffer,offset)
+		self.reads += 1
+		if self.reads == 1:
+			self.writer.write(self.params)
+		return values
+
+@contextlib.contextmanager
+def channelPair():
+
+	#The GUI's channel and the tracker's view of it. Both are in this process, which also removes the block,
+	#so the reader is opened the way the GUI reopens a channel left behind, without taking it over
+	name = 'selfTest{}'.format(os.getpid())
+	writer = TrackingChannel.create(name)
+	reader = TrackingChannel(name,create=True)
+	reader.owner = False
+	try:
+		yield writer, reader
+	finally:
+		reader.close()
+		writer.close()
+
+def checkChannelTornRead():
+
+	#A write that lands while the parameters are being read changes the sequence, so the read is retried
+	first = dict(azimuthOffset=1.0,elevationOffset=2.0,updateRate=0.5,killTracking=0)
+	second = dict(azimuthOffset=3.0,elevationOffset=4.0,updateRate=0.25,killTracking=0)
+	with channelPair() as (writer, reader):
+		writer.write(first)
+		interrupted = InterruptedParams(writer,second)
+		trackingChannel.PARAMS = interrupted
+		try:
+			params = reader.read(DEFAULT_PARAMS)
+		finally:
+			trackingChannel.PARAMS = interrupted.struct
+		expect(interrupted.reads == 2,'expected the interrupted read to be retried once, {} reads'.format(interrupted.reads))
+		expect(params == TrackingParams(**second),'read {} instead of the parameters written last'.format(params))
+	return
+
+def checkChannelWriteInProgress():
+
+	#An odd sequence is a write under way; the previous parameters are kept until it is finished
+	with channelPair() as (writer, reader):
+		writer.write(dict(azimuthOffset=1.0,elevationOffset=2.0,updateRate=0.5,killTracking=0))
+		previous = reader.read(DEFAULT_PARAMS)
+		sequence = SEQUENCE.unpack_from(writer.buffer,0)[0]
+		SEQUENCE.pack_into(writer.buffer,0,sequence + 1)
+		expect(reader.read(DEFAULT_PARAMS) == previous,'parameters read while a write was in progress')
+		SEQUENCE.pack_into(writer.buffer,0,sequence + 2)
+		expect(reader.read(DEFAULT_PARAMS) == previous,'parameters lost once the write finished')
+	return
+
+def checkChannelInvalidParams():
+
+	#An updateRate of zero would stop the tick scheduler, so the last good parameters are kept
+	with channelPair() as (writer, reader):
+		writer.write(dict(azimuthOffset=1.0,elevationOffset=2.0,updateRate=0.5,killTracking=0))
+		previous = reader.read(DEFAULT_PARAMS)
+		writer.write(dict(azimuthOffset=5.0,elevationOffset=2.0,updateRate=0.0,killTracking=0))
+		with contextlib.redirect_stdout(io.StringIO()) as output:
+			params = reader.read(previous)
+		expect(params == previous,'invalid parameters {} were used'.format(params))
+		expect('Keeping the previous tracking parameters' in output.getvalue(),'invalid parameters not reported')
+
+		#Closing the GUI closes the channel for the tracker too
+		writer.close()
+		expect(reader.read(DEFAULT_PARAMS) == DEFAULT_PARAMS and reader.closed,'channel still open after the GUI closed')
+	return
+
+def checkTickScheduler():
+
+	#Deadlines stay on the grid from the first tick. With "skip" the tick after an overrun runs at once for the
+	#latest deadline it missed and the earlier ones are dropped
+	period = 0.05
+	scheduler = TickScheduler(period,'skip')
+	deadlines = []
+	for tick in range(8):
+		deadlines.append(scheduler.wait())
+		time.sleep(0.002 if tick != 3 else 2.4*period)
+
+	for deadline in deadlines:
+		ticks = (deadline - deadlines[0])/period
+		expect(abs(ticks - round(ticks)) < 1e-6,'deadline {:.6f} s off the grid'.format(deadline - deadlines[0]))
+	expect(round((deadlines[4] - deadlines[3])/period) == 2,'overrun did not skip to the latest missed deadline')
+	expect((scheduler.overruns,scheduler.skipped) == (1,1),'expected 1 overrun and 1 skipped deadline, got {} and {}'.format(
+		scheduler.overruns,scheduler.skipped))
+	return
+
+def checkObservingSchedule():
+
+	#An object whose elevation follows a daily sine rises 3600.5 s after the start of the schedule, transits six
+	#hours later at 30 degrees and sets twelve hours after rising
+	import numpy as np
+	from observingSchedule import ObservingSchedule
+
+	start = 1.7e9
+	rise = start + 3600.5
+	def batchFunction(times):
+		return np.full(len(times),90.0), 30.0*np.sin(2*np.pi*(times - rise)/86400.0)
+
+	schedule = ObservingSchedule(batchFunction,horizon=0.0,start=start)
+	expect(abs(schedule.nextRise(start) - rise) < 1.0,'rise found at {:.1f} s, not 3600.5 s'.format(schedule.nextRise(start) - start))
+	expect(not schedule.visible(rise - 600) and schedule.visible(rise + 600),'visibility does not change at the rise')
+	window = schedule.window(rise + 600)
+	expect(abs(window[1] - (rise + 43200)) < 1.0,'set found {:.1f} s after the rise, not 43200 s'.format(window[1] - rise))
+
+	transits = [event for event in schedule.events if event.kind == "transit"]
+	expect(abs(transits[0].timestamp - (rise + 21600)) < 1.0 and abs(transits[0].elevation - 30.0) < 1e-3,
+		'transit found at {:.1f} s and {:.4f} degrees'.format(transits[0].timestamp - rise,transits[0].elevation))
+	expect(abs(schedule.nextRise(rise + 1) - (rise + 86400)) < 1.0,'next day\'s rise not found')
+	return
+
+CHECKS = [checkDecoderGarbage,checkDecoderCorruptLength,checkDecoderPartialFrames,checkDecoderWrapAround,
+	checkCodecRoundTrips,checkChannelTornRead,checkChannelWriteInProgress,checkChannelInvalidParams,
+	checkTickScheduler,checkObservingSchedule]
+
+
+if __name__ == '__main__':
+
+	failures = 0
+	for check in CHECKS:
+		try:
+			check()
+		except AssertionError as error:
+			failures += 1
+			print("FAIL {}: {}".format(check.__name__,error))
+		else:
+			print("ok   {}".format(check.__name__))
+
+	print("{} of {} checks passed".format(len(CHECKS) - failures,len(CHECKS)))
+	if failures:
+		sys.exit(1)
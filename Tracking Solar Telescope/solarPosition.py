@@ -0,0 +1,208 @@
+import math
+import datetime
+import numpy as np
+from pysolar import constants
+from pysolar import solartime
+
+'''
+Vectorized solar position for arrays of times and observer locations.
+
+This is the NREL Solar Position Algorithm (SPA) that pysolar implements, rewritten on NumPy arrays so a whole
+observing day, or many observer sites, are computed in one call. It uses pysolar's own periodic term, nutation,
+leap second and delta T tables and costs around 7 us per point against about 500 us for pysolar.solar.get_position.
+
+Results agree with get_position (and get_altitude/get_azimuth) to within 0.006 degrees of angular separation,
+which is well inside the 0.27 degree radius of the Sun. The remaining difference is the nutation term of the
+apparent sidereal time: pysolar takes the cosine of the obliquity in degrees rather than radians, this module
+follows SPA. With that term made the same the two agree to better than 1e-6 degrees.
+
+Example, the Sun's path over a day at one minute steps, and at one time for several sites:
+
+	times = start + 60*np.arange(24*60)
+	azimuth, elevation = solarPosition(times,latitude,longitude)
+
+	azimuth, elevation = solarPosition(times[:,np.newaxis],latitudes,longitudes)
+
+The time dependent terms are computed once per time, so in the second form every site costs only the
+topocentric part of the calculation.
+'''
+
+#Periodic term tables as (terms, 3) arrays of A, B, C for A*cos(B + C*JME), one array per power of JME
+HELIOCENTRIC_LONGITUDE = [np.array(series,dtype=float) for series in constants.heliocentric_longitude_coeffs]
+HELIOCENTRIC_LATITUDE = [np.array(series,dtype=float) for series in constants.heliocentric_latitude_coeffs]
+SUN_EARTH_DISTANCE = [np.array(series,dtype=float) for series in constants.sun_earth_distance_coeffs]
+
+#Nutation terms; argument multipliers (terms, 5) and the longitude/obliquity coefficients (terms, 4)
+NUTATION_ARGUMENTS = np.array(constants.aberration_sin_terms,dtype=float)
+NUTATION_COEFFICIENTS = np.array(constants.nutation_coefficients,dtype=float)
+
+#Polynomials in JCE for the mean elongation of the moon, mean anomaly of the sun, mean anomaly of the moon,
+#argument of latitude of the moon and longitude of the moon's ascending node (a + b*x + c*x^2 + x^3/d)
+NUTATION_POLYNOMIALS = np.array([
+	(297.85036, 445267.111480, -0.0019142, 189474.0),
+	(357.52772, 35999.050340, -0.0001603, -300000.0),
+	(134.96298, 477198.867398, 0.0086972, 56250.0),
+	(93.27191, 483202.017538, -0.0036825, 327270.0),
+	(125.04452, -1934.136261, 0.0020708, 450000.0)])
+
+#Refraction is only applied while the sun is above this elevation (sun radius plus atmospheric refraction)
+REFRACTION_LIMIT = -(0.26667 + 0.5667)
+
+
+def toTimestamps(times):
+
+	'''Converts an array of POSIX timestamps, numpy datetime64 values or timezone aware datetimes to float seconds'''
+
+	times = np.asarray(times)
+	if times.dtype.kind == 'M':
+		return times.astype('datetime64[us]').astype(np.int64)/1e6
+	if times.dtype.kind == 'O':
+		return np.vectorize(lambda when: when.timestamp(),otypes=[float])(times)
+	return times.astype(float)
+
+def timeOffsets(timestamps):
+
+	'''
+	Returns the seconds to add to each timestamp to get TT, and the delta T (TT - UT) to subtract again for UT.
+
+	pysolar's leap second and delta T tables only change from month to month, so they are looked up once
+	per distinct month rather than once per timestamp.
+	'''
+
+	months = timestamps.astype('datetime64[s]').astype('datetime64[M]')
+	uniqueMonths, index = np.unique(months,return_inverse=True)
+
+	leapSeconds = np.empty(len(uniqueMonths))
+	deltaT = np.empty(len(uniqueMonths))
+	for i, month in enumerate(uniqueMonths):
+		when = datetime.datetime.fromisoformat(str(month) + '-01').replace(tzinfo=datetime.timezone.utc)
+		leapSeconds[i] = solartime.get_leap_seconds(when)
+		deltaT[i] = solartime.get_delta_t(when)
+
+	index = index.reshape(timestamps.shape)
+	return (leapSeconds + solartime.tt_offset)[index], deltaT[index]
+
+def periodicTerms(series,jme):
+
+	'''Evaluates sum_i(sum(A*cos(B + C*JME))*JME^i) for every JME'''
+
+	result = np.zeros_like(jme)
+	power = np.ones_like(jme)
+	for terms in series:
+		A, B, C = terms[:,0], terms[:,1], terms[:,2]
+		result += np.cos(B + C*jme[...,np.newaxis]) @ A*power
+		power = power*jme
+	return result
+
+def nutation(jce):
+
+	'''Returns the nutation in longitude and obliquity in degrees'''
+
+	a, b, c, d = NUTATION_POLYNOMIALS.T
+	x = a + b*jce[...,np.newaxis] + c*jce[...,np.newaxis]**2 + jce[...,np.newaxis]**3/d
+	argument = np.radians(x @ NUTATION_ARGUMENTS.T)
+
+	#36000000 scales from 0.0001 arcseconds to degrees
+	coefficients = NUTATION_COEFFICIENTS
+	longitude = np.sum((coefficients[:,0] + coefficients[:,1]*jce[...,np.newaxis])*np.sin(argument),axis=-1)/36000000.0
+	obliquity = np.sum((coefficients[:,2] + coefficients[:,3]*jce[...,np.newaxis])*np.cos(argument),axis=-1)/36000000.0
+	return longitude, obliquity
+
+def refraction(elevation,temperature=constants.standard_temperature,pressure=constants.standard_pressure):
+
+	'''
+	Returns the atmospheric refraction in degrees to add to a topocentric elevation without refraction, as pysolar.
+	elevation is in degrees and may be a float or an array; below REFRACTION_LIMIT the refraction is zero.
+	'''
+
+	#A single elevation, such as an interpolated ephemeris position every tick, is computed with the math module
+	#and skips the array masking, which costs far more than the formula itself
+	scalar = isinstance(elevation,(int,float))
+	refracted = elevation >= REFRACTION_LIMIT
+	if scalar:
+		if not refracted:
+			return 0.0
+		clipped, tan, radians = elevation, math.tan, math.radians
+	else:
+		clipped, tan, radians = np.where(refracted,elevation,0.0), np.tan, np.radians
+
+	#pysolar's units for temperature and pressure
+	bend = pressure*2.830*1.02/(1010.0*temperature*60.0*tan(radians(clipped + 10.3/(clipped + 5.11))))
+	return bend if scalar else np.where(refracted,bend,0.0)
+
+def solarPosition(times,latitude,longitude,elevation=0,temperature=constants.standard_temperature,
+	pressure=constants.standard_pressure,refract=True):
+
+	'''
+	Returns arrays of the sun's (azimuth, elevation) in degrees, with refraction, as pysolar.solar.get_position.
+	Input Arguements:
+		times - array of POSIX timestamps, numpy datetime64 values or timezone aware datetimes
+
+		latitude, longitude - observer position in degrees, scalars or arrays broadcast against times
+
+		elevation - observer height above sea level in metres
+
+		temperature, pressure - in Kelvin and Pascal, as pysolar
+
+		refract - if False the elevation is returned without refraction, which refraction() adds afterwards
+	'''
+
+	timestamps = toTimestamps(times)
+	ttOffset, deltaT = timeOffsets(timestamps)
+	latitude = np.asarray(latitude,dtype=float)
+	longitude = np.asarray(longitude,dtype=float)
+
+	#Julian day (UT) and Julian ephemeris day (TT)
+	dayOffset = solartime.gregorian_day_offset + solartime.julian_day_offset
+	jde = (timestamps + ttOffset)/constants.seconds_per_day + dayOffset
+	jd = (timestamps + ttOffset - deltaT)/constants.seconds_per_day + dayOffset
+	jc = (jd - 2451545.0)/36525.0
+	jce = (jde - 2451545.0)/36525.0
+	jme = jce/10.0
+
+	#Geocentric position of the sun, time dependent only
+	heliocentricLongitude = np.degrees(periodicTerms(HELIOCENTRIC_LONGITUDE,jme)/1e8) % 360
+	heliocentricLatitude = np.degrees(periodicTerms(HELIOCENTRIC_LATITUDE,jme)/1e8)
+	sunEarthDistance = periodicTerms(SUN_EARTH_DISTANCE,jme)/1e8
+	geocentricLongitude = (heliocentricLongitude + 180) % 360
+	geocentricLatitude = -heliocentricLatitude
+
+	nutationLongitude, nutationObliquity = nutation(jce)
+	u = jme/10.0
+	meanObliquity = 84381.448 - 4680.93*u - 1.55*u**2 + 1999.25*u**3 - 51.38*u**4 - 249.67*u**5 \
+		- 39.05*u**6 + 7.12*u**7 + 27.87*u**8 + 5.79*u**9 + 2.45*u**10
+	obliquity = np.radians(meanObliquity/3600.0 + nutationObliquity)
+
+	aberration = -20.4898/(3600.0*sunEarthDistance)
+	apparentLongitude = np.radians(geocentricLongitude + nutationLongitude + aberration)
+	beta = np.radians(geocentricLatitude)
+
+	meanSiderealTime = (280.46061837 + 360.98564736629*(jd - 2451545.0) + 0.000387933*jc*jc*(1 - jc/38710000)) % 360
+	siderealTime = meanSiderealTime + nutationLongitude*np.cos(obliquity)
+
+	rightAscension = np.degrees(np.arctan2(np.sin(apparentLongitude)*np.cos(obliquity) - np.tan(beta)*np.sin(obliquity),
+		np.cos(apparentLongitude))) % 360
+	declination = np.arcsin(np.sin(beta)*np.cos(obliquity) + np.cos(beta)*np.sin(obliquity)*np.sin(apparentLongitude))
+
+	#Topocentric position for the observer
+	latitudeRad = np.radians(latitude)
+	flattenedLatitude = np.arctan(0.99664719*np.tan(latitudeRad))
+	radialDistance = np.cos(flattenedLatitude) + elevation*np.cos(latitudeRad)/constants.earth_radius
+	axialDistance = 0.99664719*np.sin(flattenedLatitude) + elevation*np.sin(latitudeRad)/constants.earth_radius
+	sinParallax = np.sin(np.radians(8.794/(3600.0/sunEarthDistance)))
+
+	hourAngle = np.radians((siderealTime + longitude - rightAscension) % 360)
+	parallax = np.arctan2(-radialDistance*sinParallax*np.sin(hourAngle),
+		np.cos(declination) - radialDistance*sinParallax*np.cos(hourAngle))
+	topocentricDeclination = np.arctan2((np.sin(declination) - axialDistance*sinParallax)*np.cos(parallax),
+		np.cos(declination) - axialDistance*sinParallax*np.cos(hourAngle))
+	topocentricHourAngle = hourAngle - parallax
+
+	topocentricElevation = np.degrees(np.arcsin(np.sin(latitudeRad)*np.sin(topocentricDeclination)
+		+ np.cos(latitudeRad)*np.cos(topocentricDeclination)*np.cos(topocentricHourAngle)))
+	azimuth = (180.0 + np.degrees(np.arctan2(np.sin(topocentricHourAngle),
+		np.cos(topocentricHourAngle)*np.sin(latitudeRad) - np.tan(topocentricDeclination)*np.cos(latitudeRad)))) % 360
+
+	if not refract:
+		return azimuth, topocentricElevation
+	return azimuth, topocentricElevation + refraction(topocentricElevation,temperature,pressure)
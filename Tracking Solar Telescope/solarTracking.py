@@ -1,12 +1,9 @@
-from pysolar.solar import *
-import pylunar as pl
-import datetime
-from pyKinesis import *
-import time
-from time import sleep
-import sys
+import os
 import json
-import numpy as np
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import serial
+from pyKinesis import ThorController, wait_all, requestHWinfo, getAllDevices, getPortIdentity
 ###############################################################################################
 #USER SETTINGS
 ###############################################################################################
@@ -24,222 +21,277 @@ azimuthKDC101SN = '27000000'
 
 #Elevation Axis KDC101 Serial Number (Elevation/Altitude Rotation Axis)
 elevationKDC101SN = '27266892'
-###############################################################################################
 
+#Predictive pointing; command where the object will be once each move has completed (True/False)
+predictivePointing = True
 
-def decdeg2dms(dd):
-	#convert decimal degrees to degrees, minutes, seconds
-    mult = -1 if dd < 0 else 1
-    mnt,sec = divmod(abs(dd)*3600, 60)
-    deg,mnt = divmod(mnt, 60)
-    return mult*deg, mult*mnt, mult*sec
+#Tracking mode; "absolute" moves each axis to the new position every update, "velocity" drives each axis
+#continuously at the object's angular rate and corrects the remaining position error periodically
+trackingMode = "absolute"
 
-def getObjectPosition(Object,Longitude,Latitude):
+#Tracking deadband; a move is skipped if its target is within this many encoder counts of the last commanded
+#position (0 only skips moves to the same encoder count)
+deadbandCounts = 0
 
-	#Returns Azimuth and Elevation in degrees
-	#Object is "Sun" or "Moon" for dictating which object to track
-	#Longitude is in degrees
-	#Latitude is in degrees
+#Adaptive update rate; when True the time between updates is chosen from the object's azimuth and elevation rates
+#so neither axis falls more than pointingTolerance degrees behind, instead of using updateRate (True/False)
+adaptiveUpdateRate = False
+pointingTolerance = 0.005
 
-	currentTime =  datetime.datetime.now(datetime.timezone.utc)
+#Closed loop tracking; the position of each axis is read back with every move and a PI correction is applied
+#to the following moves. Stalled and slipped axes are reported (True/False, absolute tracking mode only)
+closedLoop = False
 
+#Observing schedule; only track while the object is more than minimumElevation degrees above the horizon, park the
+#mount while it is down and slew to where it will rise shortly before it does (True/False)
+observingSchedule = False
+minimumElevation = 0.0
+###############################################################################################
 
-	if Object == "Sun":
-		Real_Elevation = get_altitude(Latitude,Longitude,currentTime)
-		Real_Azimuth = get_azimuth(Latitude,Longitude,currentTime)
-	elif Object == "Moon":
-		moon = pl.MoonInfo(decdeg2dms(Latitude), decdeg2dms(Longitude))
-		moon.update(currentTime)
-		Real_Elevation = moon.altitude()
-		Real_Azimuth = moon.azimuth()
+#File the serial number to COM port mapping is cached in between runs, and the parameters kept for each port
+deviceCacheFile = 'deviceCache.json'
+deviceCacheKeys = ("COM Port","Serial Number","Model","Number of Channels")
 
-	return Real_Azimuth,Real_Elevation
 
-def findControllers():
-	# Get device com ports and serial numbers
-	detectedDevices = getAllDevices()
+def probeController(port):
 
-	deviceInfo = []
+	'''
+	Identifies the K-Cube on a COM port with a single HW_REQ_INFO/HW_GET_INFO exchange.
+	The same reply confirms the cube destination byte and provides the serial number.
+	Returns the device parameters or None if no K-Cube answered.
+	'''
 
-	for device in detectedDevices:
-		#Get port number
-		comm = str(device[0])	
-		#create serial object with port
-		ser=serial.Serial(port=comm, baudrate = 115200, bytesize=8, parity=serial.PARITY_NONE, stopbits=1, xonxoff=0, rtscts=0, timeout=0.1)
-		ser.flushInput()
-		ser.flushOutput()
-		#get destination byte to rule out cube or benchtop controller
-		dest = getDestination(ser)
-		
-		#if K cube
-		if dest != 0x50:
-			print("No K-Cubes Detected; ensure deivces are connected and virtual comports enabled")
-		else:	
-			(serialNum,model,nChannels) = getHWinfo(ser,dest)
-			deviceParams = {
-			"COM Port":device[0],
-			"Serial Number":str(serialNum),
-			"Model": model,
-			"Number of Channels": nChannels}
-
-			deviceInfo.append(deviceParams)
+	ser=serial.Serial(port=port, baudrate = 115200, bytesize=8, parity=serial.PARITY_NONE, stopbits=1, xonxoff=0, rtscts=0, timeout=0.1)
+	try:
+		ser.reset_input_buffer()
+		ser.reset_output_buffer()
+		info = requestHWinfo(ser,0x50,timeout=0.25)
+	finally:
 		ser.close()
-		del ser	
 
-	return	deviceInfo
-
-def read_tracking_params():
+	#No reply from the cube destination byte
+	if info is None:
+		print("No K-Cubes Detected; ensure deivces are connected and virtual comports enabled")
+		return None
 
-	'''
-	tracking_file  = open('trackingParams.json','r')
-	tracking_params = tracking_file.readlines()
-	tracking_file.close()
+	return {
+		"COM Port":port,
+		"Serial Number":str(info.serialNumber),
+		"Model": info.model.rstrip(b'\x00').decode('ascii','replace'),
+		"Number of Channels": info.nChannels}
 
-	cleaned_data = [line.replace('\n','') for line in tracking_params]
-	param_dict = {}
-	for param in cleaned_data:
-		Split_params = param.split(':')
-		param_dict[Split_params[0]] = float(Split_params[1])
+def probeControllers(ports,serialNumbers=None):
 
 	'''
-	trackingFile  = 'trackingParams.json'
-
-	with open(trackingFile,"r") as file:
-		fileContents = file.read()
-		file.close()	
-	param_dict = json.loads(fileContents)
-	return param_dict
-
+	Probes the given COM ports at the same time and returns the parameters of each K-Cube found.
 
+	If a list of serial numbers is given, probing returns as soon as all of them have been found
+	instead of waiting for the remaining ports.
+	'''
 
-#Make sure the serial numbers are strings
-if isinstance(azimuthKDC101SN,int):
-	azimuthKDC101SN = str(azimuthKDC101SN)
+	if not ports:
+		return []
 
-if isinstance(elevationKDC101SN,int):
-	elevationKDC101SN = str(elevationKDC101SN)
+	wanted = set(serialNumbers or [])
+	deviceInfo = []
 
-#Find controller for each axis
-print("Finding Telescope Motor Controllers")
-controllers = findControllers()
-try:
-	azimuthCOMPort = [controller["COM Port"] for controller in controllers if controller["Serial Number"] == azimuthKDC101SN][0]
-	print("\tFound Azimuth Axis Motor: COM Port - {}".format(azimuthCOMPort))
-except:
-	print("KDC101 with specified azimuth axis serial number not found.")
+	pool = ThreadPoolExecutor(max_workers=len(ports))
+	probes = [pool.submit(probeController,port) for port in ports]
+	try:
+		for probe in as_completed(probes):
+			try:
+				deviceParams = probe.result()
+			except (serial.SerialException,OSError) as error:
+				print("Port Error: {}".format(error))
+				continue
+
+			if deviceParams is not None:
+				deviceInfo.append(deviceParams)
+				wanted.discard(deviceParams["Serial Number"])
+				if serialNumbers and not wanted:
+					break
+	finally:
+		#Do not wait on ports that are still being probed. Cancelled here rather than with shutdown's
+		#cancel_futures, which needs Python 3.9
+		for probe in probes:
+			probe.cancel()
+		pool.shutdown(wait=False)
 
-try:
-	elevationCOMPort = [controller["COM Port"] for controller in controllers if controller["Serial Number"] == elevationKDC101SN][0]
-	print("\tFound Elevation Axis Motor: COM Port - {}".format(elevationCOMPort))
-except:
-	print("KDC101 with specified evelvation axis serial number not found.")
+	return	deviceInfo
 
-#Create Controllers for each axis
-scale_factors = [1919.6418578623391,42941.66,14.66] #PRMTZ8 Scale Factors
+def loadDeviceCache():
 
-print("Initializing each motor controller.")
-azimuthController = ThorController(azimuthCOMPort,scale_factors,Controller_Type='cube')
-elevationController = ThorController(elevationCOMPort,scale_factors,Controller_Type='cube')
+	'''Returns the cached K-Cube parameters keyed by USB port identity, or nothing if the cache is missing or invalid'''
 
-#Enable Each Motor
-azimuthController.Enable_Channel(1)
-elevationController.Enable_Channel(1)
+	try:
+		with open(deviceCacheFile,"r") as file:
+			cache = json.load(file)
+	except (OSError,ValueError):
+		return {}
+
+	#A cache that is valid JSON but not what saveDeviceCache() writes is ignored like a corrupt one
+	if not isinstance(cache,dict):
+		return {}
+	for deviceParams in cache.values():
+		if not isinstance(deviceParams,dict) or any(key not in deviceParams for key in deviceCacheKeys) or \
+			not isinstance(deviceParams["Serial Number"],str):
+			return {}
+	return cache
+
+def saveDeviceCache(cache):
+
+	#Write then rename so an interrupted run never leaves a partial cache behind
+	tempFile = deviceCacheFile + '.tmp'
+	with open(tempFile,"w") as file:
+		json.dump(cache,file)
+	os.replace(tempFile,deviceCacheFile)
+	return
+
+def findControllers(serialNumbers=None):
 
-#Home each axis
-print("\tHoming Azimuth Axis Motor")
-azimuthController.Home(1)
-print("Homing Completed.")
-print("\tHoming Elevation Axis Motor")
-elevationController.Home(1)
-print("Homing Completed.")
+	'''
+	Returns the parameters of the K-Cubes connected to the APT COM ports.
 
-#Disable backlash correction?
+	Ports are looked up in the on-disk discovery cache first. The cached port of each requested serial
+	number is verified with a single HW_GET_INFO, and the remaining ports are only probed if a requested
+	serial number is missing from the cache or failed verification. Without a list of serial numbers
+	every port is probed.
+	'''
 
-#Get Current Sun Position
-#Current_Time = datetime.utcnow().replace(tzinfo=pytz.utc)
-Current_Time =  datetime.datetime.now(datetime.timezone.utc)
+	# Get device com ports and their USB identity
+	detectedDevices = getAllDevices()
+	portIdentities = {str(device[0]): getPortIdentity(device) for device in detectedDevices}
+	identityPorts = {identity: port for port, identity in portIdentities.items()}
 
-print("Getting Current Solar Position.")
-azimuthPosition,elevationPosition = getObjectPosition(trackingObject,userLongitude,userLatitude)
+	cache = loadDeviceCache()
+	wanted = set(serialNumbers or [])
+	deviceInfo = []
 
+	if wanted:
+		cachedPorts = [identityPorts[identity] for identity, deviceParams in cache.items()
+			if identity in identityPorts and deviceParams["Serial Number"] in wanted]
+		deviceInfo = probeControllers(cachedPorts,wanted)
+		wanted -= set(deviceParams["Serial Number"] for deviceParams in deviceInfo)
 
-if elevationPosition < 0:
-	elevationPosition = 360+elevationPosition	
-if elevationPosition > 180:
-	elevationPosition = 360 - elevationPosition
+		#Cache hit for every requested controller
+		if not wanted:
+			return deviceInfo
 
+		#Cache miss; fall back to a full scan of the ports not verified yet
+		remainingPorts = [port for port in portIdentities if port not in cachedPorts]
+		deviceInfo += probeControllers(remainingPorts,wanted)
+	else:
+		deviceInfo = probeControllers(list(portIdentities))
 
-if azimuthPosition < 0:
-		azimuthPosition = 360+azimuthPosition			
+	for deviceParams in deviceInfo:
+		cache[portIdentities[deviceParams["COM Port"]]] = deviceParams
+	try:
+		saveDeviceCache(cache)
+	except OSError as error:
+		print("Unable to save the device cache: {}".format(error))
 
-#Move to New positions before starting tracking
+	return	deviceInfo
 
-print('\tElevation: {}'.format(np.round(elevationPosition,4)))
-print('\tAzimuth: {}'.format(np.round(azimuthPosition,4)))
 
-print("\nMoving Elevation axis to current position.")
-if elevationPosition<0:
-	print("\t\tInvalid Elevation: Elevation must be above zero degrees")
-else:	
-	elevationController.Move_Absolute(elevationPosition,1,wait=True)
+def listDevices():
 
-print("\nMoving Azimuth axis to current position.")
-azimuthController.Move_Absolute(azimuthPosition,1,wait=True)		
+	#Prints every K-Cube found on the APT COM ports
 
+	deviceInfo = findControllers()
+	for deviceParams in sorted(deviceInfo,key=lambda deviceParams: deviceParams["COM Port"]):
+		print("{COM Port}\t{Serial Number}\t{Model}\t{Number of Channels} channel(s)".format(**deviceParams))
+	return
 
+def main():
 
-X = input('\n\tTo start tracking, hit enter...')
+	#The tracking engine, NumPy and the position modules are only imported once the controllers are found
+	from trackingEngine import TrackingEngine
 
-tracking_params = {"azimuthOffset":0.0,
-	"elevationOffset":0,
-	"updateRate":1,
-	"killTracking":0}
+	#Make sure the serial numbers are strings
+	azimuthSN = str(azimuthKDC101SN)
+	elevationSN = str(elevationKDC101SN)
 
-#print('\n\n\tTo stop tracking, hit enter...') #need to implement still
-#Start continuous tracking
-while True:
+	#Find controller for each axis
+	print("Finding Telescope Motor Controllers")
+	controllers = findControllers([azimuthSN,elevationSN])
+	try:
+		azimuthCOMPort = [controller["COM Port"] for controller in controllers if controller["Serial Number"] == azimuthSN][0]
+		print("\tFound Azimuth Axis Motor: COM Port - {}".format(azimuthCOMPort))
+	except:
+		print("KDC101 with specified azimuth axis serial number not found.")
 
-	#get Offsets and calculate current positions
 	try:
-		tracking_params  = read_tracking_params()
+		elevationCOMPort = [controller["COM Port"] for controller in controllers if controller["Serial Number"] == elevationSN][0]
+		print("\tFound Elevation Axis Motor: COM Port - {}".format(elevationCOMPort))
 	except:
-		pass	
+		print("KDC101 with specified evelvation axis serial number not found.")
 
-	Current_Time = datetime.datetime.now(datetime.timezone.utc)
-	#Get New Positions
-	azimuthPosition,elevationPosition = getObjectPosition(trackingObject,userLongitude,userLatitude)
+	#Create Controllers for each axis
+	scale_factors = [1919.6418578623391,42941.66,14.66] #PRMTZ8 Scale Factors
 
-	azimuthPosition += tracking_params['azimuthOffset']
-	elevationPosition += tracking_params['elevationOffset']
+	print("Initializing each motor controller.")
+	azimuthController = ThorController(azimuthCOMPort,scale_factors,Controller_Type='cube')
+	elevationController = ThorController(elevationCOMPort,scale_factors,Controller_Type='cube')
 
-	#Helps with complenatary angle to reduce the path of movement
-	if elevationPosition < 0:
-		elevationPosition = 360+elevationPosition
-	if elevationPosition > 180:
-		elevationPosition = 360 - elevationPosition	
+	#Enable Each Motor
+	azimuthController.Enable_Channel(1)
+	elevationController.Enable_Channel(1)
 
-	if azimuthPosition < 0:
-			azimuthPosition = 360+azimuthPosition
-	#if azimuthPosition > 180:
-	#	azimuthPosition = 360 - azimuthPosition		
+	#Home both axes at the same time
+	print("\tHoming Azimuth and Elevation Axis Motors")
+	homes = [azimuthController.Home(1,wait=False),elevationController.Home(1,wait=False)]
 
-	print("\r\t\tAzimuth: {}\t\tElevation: {}".format(np.round(azimuthPosition,4),np.round(elevationPosition,4)),end='')
-	#Move to New positions
-	elevationController.Move_Absolute(elevationPosition,1,wait=False)
-	azimuthController.Move_Absolute(azimuthPosition,1,wait=False)	
+	#The ephemeris is loaded and computed while the axes are homing
+	print("Getting Current Solar Position.")
+	engine = TrackingEngine(azimuthController,elevationController,trackingObject,userLongitude,userLatitude,
+		predictivePointing=predictivePointing,trackingMode=trackingMode,deadbandCounts=deadbandCounts,
+		adaptiveUpdateRate=adaptiveUpdateRate,pointingTolerance=pointingTolerance,closedLoop=closedLoop,
+		observingSchedule=observingSchedule,horizon=minimumElevation)
 
-	
-	sleep(tracking_params['updateRate'])
-	#Break from loop with user input
-	if tracking_params['killTracking'] == 1:
-		print('\nTracking Terminated')
-		break
+	wait_all(homes)
+	print("Homing Completed.")
 
+	#Disable backlash correction?
 
+	if engine.schedule is not None:
+		print("\n{} schedule for the next 24 hours:".format(trackingObject))
+		for line in engine.schedule.summary():
+			print('\t' + line)
+		if not engine.schedule.visible():
+			print("\n{} is below the horizon, the mount will wait at its rise position.".format(trackingObject))
 
-elevationController.Close_Port()
-azimuthController.Close_Port()
-del elevationController
-del azimuthController
+	#Move to New positions before starting tracking
+	azimuthPosition,elevationPosition = engine.slewTarget()
 
+	print('\tElevation: {}'.format(round(elevationPosition,4)))
+	print('\tAzimuth: {}'.format(round(azimuthPosition,4)))
 
+	#Slew both axes at the same time
+	print("\nMoving Elevation and Azimuth axes to current position.")
+	engine.slew()
+
+	X = input('\n\tTo start tracking, hit enter...')
+
+	#print('\n\n\tTo stop tracking, hit enter...') #need to implement still
+	#Start continuous tracking
+	try:
+		engine.run()
+	finally:
+		elevationController.Close_Port()
+		azimuthController.Close_Port()
+		del elevationController
+		del azimuthController
+	return
+
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description='Tracks the Sun or the Moon with two KDC101 driven PRMTZ8 stages, '
+		'using the USER SETTINGS at the top of this file')
+	parser.add_argument('--list-devices',action='store_true',help='list the K-Cubes connected and exit')
+	args = parser.parse_args()
+
+	if args.list_devices:
+		listDevices()
+	else:
+		main()
@@ -1,7 +1,9 @@
 
+import os
 import json
 import PySimpleGUI as sg
 import numpy as np
+from trackingChannel import TrackingChannel
 
 def readTrackingParams():
 
@@ -18,9 +20,15 @@ def readTrackingParams():
 
 def writeTrackingParams(paramDict):
 
+	#The tracker reads the parameters from the shared memory channel, the file is kept for when the GUI is closed
+	channel.write(paramDict)
+
+	#Write then rename so the tracker never reads a partially written file
 	trackingFile  = 'trackingParams.json'	
-	with open(trackingFile, "w") as outFile:
+	tempFile = trackingFile + '.tmp'
+	with open(tempFile, "w") as outFile:
 		json.dump(paramDict, outFile)
+	os.replace(tempFile, trackingFile)
 
 	return	
 
@@ -40,6 +48,8 @@ defaultParams = {"azimuthOffset":0.0,
 
 trackParams = defaultParams
 
+#Shared memory channel the tracking parameters are sent to solarTracking.py through
+channel = TrackingChannel.create()
 writeTrackingParams(defaultParams)
 
 aziUP = sg.Button("+",key="-aziIncrease-", enable_events=True)
@@ -90,7 +100,8 @@ while True:
     	trackParams['killTracking'] = 1
     	writeTrackingParams(trackParams)
 
-window.close()            
+window.close()
+channel.close()            
 
 
 
@@ -0,0 +1,117 @@
+import time
+from collections import deque
+
+'''
+Drift free periodic scheduler for the tracking loop.
+
+Ticks are scheduled on a fixed grid of deadlines from time.monotonic() instead of sleeping for the period after
+the work of each tick, so the work time does not add to the period and the loop does not drift:
+
+	scheduler = TickScheduler(0.25)
+	while tracking:
+		scheduler.wait()
+		...work...
+
+	print(scheduler.summary())
+
+The lateness of every wake up (jitter) is recorded. A tick whose work runs past the next deadline is an overrun,
+and what happens to the deadlines it missed is set by the catch up policy:
+
+	"skip"  - missed deadlines are dropped and the loop continues on the original grid (default)
+	"burst" - missed ticks are run back to back without sleeping until the loop has caught up
+	"reset" - the grid is restarted from the time of the late tick
+'''
+
+CATCH_UP_POLICIES = ('skip','burst','reset')
+
+#The last part of every wait is spent polling the clock, as sleep() can oversleep by a fraction of a millisecond
+SPIN_TIME = 0.0005
+
+#Number of recent wake ups kept for the jitter statistics
+JITTER_SAMPLES = 1000
+
+
+class TickScheduler:
+
+	def __init__(self,period,catchUp='skip',spin=SPIN_TIME):
+
+		'''
+		Creates a scheduler ticking every period seconds.
+		Input Arguements:
+			period - seconds between ticks
+
+			catchUp - "skip", "burst" or "reset"; what to do with deadlines missed by an overrun
+
+			spin - seconds before each deadline spent polling the clock instead of sleeping
+		'''
+
+		if catchUp not in CATCH_UP_POLICIES:
+			raise ValueError('Invalid catch up policy %r, must be one of %s' % (catchUp,', '.join(CATCH_UP_POLICIES)))
+
+		self.period = float(period)
+		self.catchUp = catchUp
+		self.spin = spin
+		self.deadline = None
+
+		self.ticks = 0
+		self.overruns = 0
+		self.skipped = 0
+		self.jitter = deque(maxlen=JITTER_SAMPLES)
+
+	def wait(self,period=None):
+
+		'''
+		Sleeps until the next deadline and returns its time.monotonic() time. The first call returns straight away
+		and starts the grid. If period is given it is used from this tick on, like changing updateRate at runtime.
+		'''
+
+		now = time.monotonic()
+		if period is not None:
+			self.period = float(period)
+
+		if self.deadline is None:
+			self.deadline = now
+		else:
+			self.deadline += self.period
+
+		if now > self.deadline:
+			#The previous tick's work ran past this tick's deadline
+			self.overruns += 1
+			missed = int((now - self.deadline)/self.period)
+			if self.catchUp == 'skip':
+				self.skipped += missed
+				self.deadline += missed*self.period
+			elif self.catchUp == 'reset':
+				self.skipped += missed
+				self.deadline = now
+
+		remaining = self.deadline - now
+		if remaining > self.spin:
+			time.sleep(remaining - self.spin)
+		while time.monotonic() < self.deadline:
+			pass
+
+		self.jitter.append(time.monotonic() - self.deadline)
+		self.ticks += 1
+		return self.deadline
+
+	def stats(self):
+
+		'''Returns the tick count, overruns, skipped deadlines and the jitter (seconds) of the recent wake ups'''
+
+		samples = sorted(self.jitter)
+		if not samples:
+			samples = [0.0]
+		return {
+			"ticks": self.ticks,
+			"overruns": self.overruns,
+			"skipped": self.skipped,
+			"mean jitter": sum(samples)/len(samples),
+			"p99 jitter": samples[min(len(samples)-1,int(0.99*len(samples)))],
+			"max jitter": samples[-1]}
+
+	def summary(self):
+
+		stats = self.stats()
+		return '{ticks} ticks, {overruns} overruns, {skipped} skipped deadlines, jitter mean {:.3f} ms, p99 {:.3f} ms, max {:.3f} ms'.format(
+			stats["mean jitter"]*1e3,stats["p99 jitter"]*1e3,stats["max jitter"]*1e3,**stats)
@@ -0,0 +1,188 @@
+import sys
+import struct
+from collections import namedtuple
+from multiprocessing import shared_memory, resource_tracker
+
+'''
+Shared memory control channel between solarTrackingGUI.py and solarTracking.py.
+
+The GUI creates a small shared memory block holding the tracking parameters and writes them whenever a button
+is pressed, and the tracker reads them every update. Offset changes reach the tracker at its next update without
+any file being written, opened or parsed.
+
+The parameters are guarded by a sequence counter (a seqlock). The writer makes the counter odd, writes the
+parameters and makes it even again. A reader that sees an odd counter, or a counter that changed while it was
+reading, knows it caught a write half way through and reads again, so a torn set of parameters is never used:
+
+	channel = TrackingChannel.create()              #GUI
+	channel.write(params)
+
+	channel = openChannel()                         #Tracker, None while the GUI is not running
+	params = channel.read(params)
+
+When the GUI closes it marks the channel closed and removes it. The tracker then drops the channel and goes
+back to trackingParams.json until the GUI is started again.
+'''
+
+#Immutable snapshot of the tracking parameters handed to the tracking loop
+TrackingParams = namedtuple('TrackingParams',['azimuthOffset','elevationOffset','updateRate','killTracking'])
+
+DEFAULT_PARAMS = TrackingParams(azimuthOffset=0.0,elevationOffset=0.0,updateRate=1.0,killTracking=0)
+
+CHANNEL_NAME = 'solarTrackingParams'
+
+#Sequence counter, followed by azimuthOffset, elevationOffset, updateRate, killTracking and the open flag
+SEQUENCE = struct.Struct('<Q')
+PARAMS = struct.Struct('<dddii')
+CHANNEL_SIZE = SEQUENCE.size + PARAMS.size
+
+#Reads retried while the writer is part way through a write before the previous parameters are kept
+READ_RETRIES = 100
+
+
+def attach(name):
+
+	'''
+	Opens an existing shared memory block without handing it to Python's resource tracker. The tracker removes
+	every block a process has opened when it exits, which would remove the channel from under the GUI when the
+	tracking software exits.
+	'''
+
+	if sys.version_info >= (3,13):
+		return shared_memory.SharedMemory(name,track=False)
+
+	#Before Python 3.13 the block can only be taken back off the tracker through its private name attribute
+	memory = shared_memory.SharedMemory(name)
+	try:
+		resource_tracker.unregister(memory._name,'shared_memory')
+	except (AttributeError,KeyError):
+		pass
+	return memory
+
+def openChannel(name=CHANNEL_NAME):
+
+	'''Returns the channel created by the GUI, or None if it is not running'''
+
+	try:
+		return TrackingChannel(name)
+	except (FileNotFoundError,ValueError):
+		return None
+
+
+class TrackingChannel:
+
+	def __init__(self,name=CHANNEL_NAME,create=False):
+
+		'''
+		Opens the shared memory channel.
+		Input Arguements:
+			name - name of the shared memory block, the same in both programs
+
+			create - True in the GUI to create the channel (or reuse one left behind by a GUI that did not close)
+		'''
+
+		self.name = name
+		self.owner = create
+		if create:
+			try:
+				self.memory = shared_memory.SharedMemory(name,create=True,size=CHANNEL_SIZE)
+			except FileExistsError:
+				self.memory = shared_memory.SharedMemory(name)
+		else:
+			self.memory = attach(name)
+
+		if self.memory.size < CHANNEL_SIZE:
+			self.memory.close()
+			raise ValueError('Shared memory block {} is too small for the tracking parameters'.format(name))
+
+		self.buffer = self.memory.buf
+		self.sequence = None
+		self.params = None
+
+	@classmethod
+	def create(cls,name=CHANNEL_NAME):
+
+		return cls(name,create=True)
+
+	def write(self,params):
+
+		'''Publishes a dictionary of tracking parameters; only the GUI writes'''
+
+		self.params = TrackingParams(**params)
+		self.publish(self.params,1)
+		return
+
+	def publish(self,params,isOpen):
+
+		sequence = SEQUENCE.unpack_from(self.buffer,0)[0]
+		#An odd count marks a write in progress
+		sequence += 1 if sequence % 2 == 0 else 2
+		SEQUENCE.pack_into(self.buffer,0,sequence)
+		PARAMS.pack_into(self.buffer,SEQUENCE.size,float(params.azimuthOffset),float(params.elevationOffset),
+			float(params.updateRate),int(params.killTracking),isOpen)
+		SEQUENCE.pack_into(self.buffer,0,sequence + 1)
+		return
+
+	@property
+	def closed(self):
+
+		return self.memory is None
+
+	def read(self,default=None):
+
+		'''
+		Returns the latest tracking parameters as a TrackingParams. default is returned while nothing has been written,
+		and the previous parameters if every retry caught a write in progress or the parameters written are not
+		valid (an updateRate that is not above zero or a killTracking other than 0 or 1), as for trackingParams.json.
+		Once the GUI has closed the channel is closed as well (see closed) and default is returned.
+		'''
+
+		if self.memory is None:
+			return default
+		previous = self.params if self.params is not None else default
+
+		for attempt in range(READ_RETRIES):
+			sequence = SEQUENCE.unpack_from(self.buffer,0)[0]
+			if sequence == self.sequence:
+				#Nothing written since the last read
+				return previous
+			if sequence % 2:
+				continue
+
+			azimuthOffset,elevationOffset,updateRate,killTracking,isOpen = PARAMS.unpack_from(self.buffer,SEQUENCE.size)
+			if SEQUENCE.unpack_from(self.buffer,0)[0] != sequence:
+				continue
+
+			if sequence == 0:
+				return default
+			if not isOpen:
+				self.close()
+				return default
+
+			self.sequence = sequence
+			if not updateRate > 0 or killTracking not in (0,1):
+				print("\nKeeping the previous tracking parameters: updateRate {!r} and killTracking {!r} from {} are not "
+					"valid".format(updateRate,killTracking,self.name))
+				return previous
+			self.params = TrackingParams(azimuthOffset,elevationOffset,updateRate,killTracking)
+			return self.params
+
+		return previous
+
+	def close(self):
+
+		'''Closes the channel; in the GUI it is also marked closed for the tracker and removed'''
+
+		if self.memory is None:
+			return
+		if self.owner:
+			self.publish(self.params or DEFAULT_PARAMS,0)
+		self.buffer = None
+		self.memory.close()
+		if self.owner:
+			try:
+				self.memory.unlink()
+			except FileNotFoundError:
+				pass
+		self.memory = None
+		return
@@ -0,0 +1,936 @@
+import os
+import sys
+import time
+import json
+import datetime
+import ctypes
+import ctypes.util
+from struct import Struct
+from functools import lru_cache
+from collections import deque
+from pyKinesis import wait_all, STATUS_MOVING_FORWARD, STATUS_MOVING_REVERSE
+from tickScheduler import TickScheduler
+from trackingChannel import openChannel, TrackingParams, DEFAULT_PARAMS, CHANNEL_NAME
+
+'''
+Tracking engine for the solar telescope.
+
+Everything the tracking loop does is held by a TrackingEngine, driven by whoever owns the motor controllers.
+Importing this module has no side effects; no ports are opened and nothing is moved until the engine is used.
+solarTracking.py is the command line program built on it:
+
+	engine = TrackingEngine(azimuthController,elevationController,"Sun",userLongitude,userLatitude)
+	engine.slew()
+	engine.start()
+	while engine.step():
+		engine.wait()
+	engine.stop()
+
+or engine.run() for the same loop with the status line printed. step() computes one update and sends its moves
+without waiting, so benchmarks and tests can drive it with simulated controllers (aptSimulator.py), their own
+times and their own tracking parameters, and several mounts can be run from one loop with an engine each.
+
+With the observing schedule (observingSchedule.py, off by default) the engine only tracks while the object is
+above the horizon. Once it sets the elevation axis is parked and the engine sends nothing to the controllers until
+PRESLEW_LEAD seconds before the next rise, when both axes are slewed to the rise position to be ready to track.
+
+The position modules are imported when the ephemeris is created, and only for the object tracked; pysolar for the
+Sun and pylunar for the Moon. NumPy is only loaded with them, so importing the engine stays cheap.
+'''
+
+#File the tracking parameters are read from while the GUI's control channel is not available
+TRACKING_PARAMS_FILE = 'trackingParams.json'
+
+#inotify flags and event header (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = Struct('iIII')
+INOTIFY_BUFFER_SIZE = 4096
+
+#Command to completion latency assumed until tracking moves have been measured, and how many recent moves are kept
+INITIAL_LATENCY = 0.5
+LATENCY_SAMPLES = 20
+
+#Velocity tracking; seconds over which a measured position error is driven out, error (degrees) above which the
+#axis is realigned with an absolute move instead, and acceleration (degrees/s^2) used for velocity changes
+VELOCITY_CORRECTION_PERIOD = 30.0
+VELOCITY_MAX_ERROR = 0.05
+TRACKING_ACCELERATION = 1.0
+
+#Closed loop PI gains, largest correction applied (degrees), and error (degrees) of a settled axis above which
+#it is reported as stalled or slipped instead of being corrected
+FEEDBACK_KP = 0.5
+FEEDBACK_KI = 0.1
+FEEDBACK_MAX_CORRECTION = 0.05
+FEEDBACK_MAX_ERROR = 0.02
+
+#Limits of the adaptive time between updates in seconds
+MIN_UPDATE_INTERVAL = 0.1
+MAX_UPDATE_INTERVAL = 10.0
+
+#Seconds between attempts to open the GUI's control channel while it is not running
+CHANNEL_RETRY = 2.0
+
+#Observing schedule; seconds before the object rises that the mount is slewed to the rise position, longest
+#sleep between updates while parked (the tracking parameters are still read), and elevation the mount is parked at
+PRESLEW_LEAD = 60.0
+PARKED_UPDATE_INTERVAL = 5.0
+PARK_ELEVATION = 0.0
+
+#What the tracking loop does with updates missed because an update took longer than updateRate (see tickScheduler.py)
+TICK_CATCH_UP = 'skip'
+
+
+@lru_cache(maxsize=None)
+def getMoonTracker(Latitude,Longitude):
+
+	#Returns the MoonTracker for an observer, created on first use and kept for every later position
+
+	#pylunar is only loaded when the Moon is tracked
+	from moonPosition import MoonTracker
+	return MoonTracker(Latitude,Longitude)
+
+def getObjectPosition(Object,Longitude,Latitude,when=None):
+
+	#Returns Azimuth and Elevation in degrees
+	#Object is "Sun" or "Moon" for dictating which object to track
+	#Longitude is in degrees
+	#Latitude is in degrees
+	#when is a timezone aware datetime, defaults to now
+
+	if when is None:
+		currentTime =  datetime.datetime.now(datetime.timezone.utc)
+	else:
+		currentTime = when
+
+
+	if Object == "Sun":
+		#Azimuth and altitude from a single solar position calculation
+		from pysolar.solar import get_position
+		Real_Azimuth,Real_Elevation = get_position(Latitude,Longitude,currentTime)
+	elif Object == "Moon":
+		Real_Azimuth,Real_Elevation = getMoonTracker(Latitude,Longitude).position(currentTime)
+
+	return Real_Azimuth,Real_Elevation
+
+class MoveLatency:
+
+	'''
+	Online estimate of the time from commanding a tracking move until the stage has arrived at the new position.
+	Each move is timed from the time its command was sent (the CompletionFuture's sent) until its own
+	MGMSG_MOT_MOVE_COMPLETED is received, and the median of the most recent moves is used so a single slow reply
+	does not throw the pointing lead off.
+	'''
+
+	def __init__(self,initial=INITIAL_LATENCY,samples=LATENCY_SAMPLES):
+
+		self.samples = deque(maxlen=samples)
+		self.latency = initial
+
+	def track(self,moveComplete):
+
+		#Called from the reader thread once the move has completed; replaced moves are cancelled and not measured
+		def measured(future):
+			if not future.cancelled() and future.exception() is None and future.sent is not None:
+				self.samples.append(time.monotonic() - future.sent)
+				self.latency = sorted(self.samples)[len(self.samples)//2]
+
+		moveComplete.add_done_callback(measured)
+		return moveComplete
+
+class AxisDeadband:
+
+	'''
+	Skips absolute tracking moves that would not move the stage. Targets are quantized to device units the same way
+	as Move_Absolute, and a move within threshold counts of the last commanded one is suppressed and counted.
+	'''
+
+	def __init__(self,controller,threshold=0,channel_num=1):
+
+		self.controller = controller
+		self.threshold = threshold
+		self.channel_num = channel_num
+		self.commanded = None
+		self.sent = 0
+		self.suppressed = 0
+
+	def move(self,Position,flush=True):
+
+		#Returns the move's CompletionFuture, or None if the move was suppressed
+
+		dUnits = int(self.controller.posScaleFactor*Position)
+		if self.commanded is not None and abs(dUnits - self.commanded) <= self.threshold:
+			self.suppressed += 1
+			return None
+
+		self.commanded = dUnits
+		self.sent += 1
+		return self.controller.Move_Absolute(Position,self.channel_num,wait=False,flush=flush)
+
+class ClosedLoopAxis:
+
+	'''
+	PI correction of one axis from its position read back with every tracking move.
+
+	A status request is queued ahead of each move and both are written together, so the readback costs no extra
+	write or wait; the reply is handled by the reader thread when it arrives. As it is answered before the new move
+	starts, it shows where the previous move left the stage, which is compared with that move's target.
+
+	While the stage is still moving the reading is ignored. A settled stage more than FEEDBACK_MAX_ERROR off target
+	is flagged as stalled if it has not moved since the previous reading, or as slipped if it moved to the wrong
+	place, and the correction is held until the error is back within limits.
+	'''
+
+	def __init__(self,controller,deadband,channel_num=1):
+
+		self.controller = controller
+		self.deadband = deadband
+		self.channel_num = channel_num
+
+		self.target = None
+		self.reply = None
+		self.lastPosition = None
+
+		self.error = 0.0
+		self.integral = 0.0
+		self.correction = 0.0
+		self.state = 'OK'
+		self.stalls = 0
+		self.slips = 0
+
+	def move(self,Position):
+
+		#Returns the move's CompletionFuture, or None if the move was suppressed by the deadband
+
+		#A reply that never arrived is not waited for any longer
+		if self.reply is not None and not self.reply.done():
+			self.reply.cancel()
+
+		#The status request is queued first so it is answered before the new move starts
+		self.reply = self.controller.Request_Status(self.channel_num,flush=False)
+		target = self.target
+		self.reply.add_done_callback(lambda reply: self.feedback(target,reply))
+
+		move = self.deadband.move(Position + self.correction,flush=False)
+		self.controller.Flush_Commands()
+
+		if move is not None:
+			self.target = Position
+		return move
+
+	def feedback(self,target,reply):
+
+		#Called from the reader thread with the status answered before the move following target
+
+		if target is None or reply.cancelled() or reply.exception() is not None:
+			return
+
+		status = reply.result().data
+		position = status.position/float(self.controller.posScaleFactor)
+		if status.statusBits & (STATUS_MOVING_FORWARD|STATUS_MOVING_REVERSE):
+			return
+
+		self.error = target - position
+		if abs(self.error) > FEEDBACK_MAX_ERROR:
+			countsMoved = abs(position - self.lastPosition)*self.controller.posScaleFactor if self.lastPosition is not None else None
+			if countsMoved is not None and countsMoved < 1:
+				if self.state != 'Stalled':
+					self.stalls += 1
+				self.state = 'Stalled'
+			else:
+				if self.state != 'Slipped':
+					self.slips += 1
+				self.state = 'Slipped'
+		else:
+			self.state = 'OK'
+			self.integral += self.error
+			correction = FEEDBACK_KP*self.error + FEEDBACK_KI*self.integral
+			#Anti-windup; the integral stops growing once the correction is limited
+			if abs(correction) > FEEDBACK_MAX_CORRECTION:
+				self.integral -= self.error
+				correction = max(-FEEDBACK_MAX_CORRECTION,min(FEEDBACK_MAX_CORRECTION,correction))
+			self.correction = correction
+
+		self.lastPosition = position
+		return
+
+class VelocityAxis:
+
+	'''
+	Drives one axis continuously at the tracked object's angular rate with velocity moves.
+
+	Every VELOCITY_CORRECTION_PERIOD seconds the axis position from the automatic status updates is compared with
+	the ephemeris, and the velocity is offset so that the error is gone by the next correction. A velocity is only
+	sent when it differs from the last one in device units, so the stage runs smoothly between corrections. An
+	error above VELOCITY_MAX_ERROR (a changed offset or a slipped axis) stops the axis and realigns it with an
+	absolute move at its normal move profile.
+
+	The stop and the realigning move are not waited for, so neither the tick nor the other axis is held up. Later
+	updates check for their completion (or their deadline) and only then send the next command.
+	'''
+
+	def __init__(self,controller,channel_num=1):
+
+		self.controller = controller
+		self.channel_num = channel_num
+
+		#Velocity moves replace the move profile, it is put back for absolute moves
+		self.slewVelocity,self.slewAcceleration = controller.Get_Velocity_Params(channel_num)
+		controller.Start_Update_Messages(channel_num)
+
+		self.correction = 0.0
+		self.lastCorrection = None
+		self.realigned = time.monotonic()
+		self.commanded = None
+
+		#CompletionFutures of the stop and of the absolute move of a realignment under way
+		self.stopping = None
+		self.realigning = None
+
+	def pending(self,future):
+
+		#True while the future's operation is running and its deadline has not passed
+		return future is not None and not future.done() and not future.expire()
+
+	def update(self,target,rate,now):
+
+		#target and rate in degrees and degrees/s at the time.time() time now
+
+		if self.pending(self.stopping) or self.pending(self.realigning):
+			return
+		if self.stopping is not None:
+			#Stopped, move to where the object is now at the normal move profile
+			self.stopping = None
+			self.controller.Set_Velocity_Params(self.slewVelocity,self.slewAcceleration,self.channel_num,flush=False)
+			self.realigning = self.controller.Move_Absolute(target,self.channel_num,wait=False)
+			return
+		if self.realigning is not None:
+			#Realigned; only status updates from after the move are used for the corrections
+			self.realigning = None
+			self.realigned = time.monotonic()
+
+		status = self.controller.Latest_Status(self.channel_num)
+		due = self.lastCorrection is None or now - self.lastCorrection >= VELOCITY_CORRECTION_PERIOD
+		if due and status is not None and status.timestamp > self.realigned:
+			#Where the object was when the status was received
+			error = target - rate*(time.monotonic() - status.timestamp) - status.position
+			if abs(error) > VELOCITY_MAX_ERROR:
+				self.realign(target)
+				return
+			self.correction = error/VELOCITY_CORRECTION_PERIOD
+			self.lastCorrection = now
+
+		velocity = rate + self.correction
+		dUnits = int(round(velocity*self.controller.velScaleFactor))
+		if dUnits != self.commanded:
+			self.controller.Move_Velocity(velocity,TRACKING_ACCELERATION,self.channel_num)
+			self.commanded = dUnits
+		return
+
+	def realign(self,target):
+
+		#The absolute move to the target is sent by update() once the stop has completed
+		self.stopping = self.controller.Stop(self.channel_num,wait=False)
+
+		self.correction = 0.0
+		self.lastCorrection = None
+		self.commanded = None
+		return
+
+	def stop(self):
+
+		#A realignment under way is abandoned, its stop would otherwise take the MGMSG_MOT_MOVE_STOPPED of this one
+		for future in (self.stopping,self.realigning):
+			if future is not None:
+				future.cancel()
+		self.controller.Stop(self.channel_num)
+		self.controller.Set_Velocity_Params(self.slewVelocity,self.slewAcceleration,self.channel_num)
+		self.controller.Stop_Update_Messages(self.channel_num)
+		return
+
+def adaptiveUpdateInterval(azimuthRate,elevationRate,tolerance,predictive=True):
+
+	'''
+	Returns the seconds until the next update so that neither axis moves more than tolerance degrees in between,
+	clamped to MIN_UPDATE_INTERVAL and MAX_UPDATE_INTERVAL. Rates are in degrees/s. With predictive pointing
+	each axis is centred on the object over the update, so the same error allows twice the interval.
+	'''
+
+	rate = max(abs(azimuthRate),abs(elevationRate))
+	if predictive:
+		tolerance = 2*tolerance
+	if rate == 0:
+		return MAX_UPDATE_INTERVAL
+	return min(MAX_UPDATE_INTERVAL,max(MIN_UPDATE_INTERVAL,tolerance/rate))
+
+def read_tracking_params(trackingFile=TRACKING_PARAMS_FILE):
+
+	'''
+	Reads and validates the tracking parameters file and returns them as a TrackingParams.
+	Raises OSError if the file cannot be read and ValueError if it is not valid JSON or a parameter is missing
+	or of the wrong type.
+	'''
+
+	with open(trackingFile,"r") as file:
+		param_dict = json.loads(file.read())
+
+	if not isinstance(param_dict,dict):
+		raise ValueError('{} does not contain a JSON object'.format(trackingFile))
+
+	params = {}
+	for key, default in DEFAULT_PARAMS._asdict().items():
+		if key not in param_dict:
+			raise ValueError('{} is missing {}'.format(trackingFile,key))
+		value = param_dict[key]
+		#bool is an int, but true/false is not a valid offset or rate
+		if isinstance(value,bool) or not isinstance(value,(int,float)):
+			raise ValueError('{} in {} must be a number, not {!r}'.format(key,trackingFile,value))
+		params[key] = type(default)(value)
+
+	if params["updateRate"] <= 0:
+		raise ValueError('updateRate in {} must be above zero, not {!r}'.format(trackingFile,params["updateRate"]))
+	if param_dict["killTracking"] not in (0,1):
+		raise ValueError('killTracking in {} must be 0 or 1, not {!r}'.format(trackingFile,param_dict["killTracking"]))
+
+	return TrackingParams(**params)
+
+def inotifyWatch(directory):
+
+	'''
+	Returns a non-blocking inotify file descriptor reporting files written, renamed into or removed from
+	directory, or None where inotify is not available (not Linux, or the watch limit is reached).
+	'''
+
+	if not sys.platform.startswith('linux'):
+		return None
+	try:
+		libc = ctypes.CDLL(ctypes.util.find_library('c'),use_errno=True)
+		fd = libc.inotify_init1(IN_NONBLOCK|IN_CLOEXEC)
+	except (OSError,AttributeError):
+		return None
+	if fd < 0:
+		return None
+
+	if libc.inotify_add_watch(fd,os.fsencode(directory),IN_CLOSE_WRITE|IN_MOVED_TO|IN_CREATE|IN_DELETE) < 0:
+		os.close(fd)
+		return None
+	return fd
+
+class ParamsWatcher:
+
+	'''
+	Reloads the tracking parameters file only when it changes instead of parsing it every update.
+
+	On Linux the directory of the file is watched with inotify, so poll() is a single non-blocking read that
+	returns straight away while nothing has changed. Elsewhere the mtime, size and inode of the file from
+	os.stat are compared with the last load. The directory rather than the file is watched as the GUI replaces
+	the file with a rename.
+
+	A file that fails validation is reported and the last valid parameters are kept, so poll() always returns a
+	complete, immutable TrackingParams.
+	'''
+
+	def __init__(self,trackingFile=TRACKING_PARAMS_FILE,default=DEFAULT_PARAMS):
+
+		self.trackingFile = trackingFile
+		self.name = os.fsencode(os.path.basename(trackingFile))
+		self.params = default
+		self.signature = None
+		self.reloads = 0
+		self.fd = inotifyWatch(os.path.dirname(os.path.abspath(trackingFile)))
+		self.reload()
+
+	def changed(self):
+
+		if self.fd is not None:
+			try:
+				events = os.read(self.fd,INOTIFY_BUFFER_SIZE)
+			except BlockingIOError:
+				return False
+
+			#inotify_event records; wd, mask, cookie, name length and the null padded name
+			changed = False
+			offset = 0
+			while offset < len(events):
+				wd, mask, cookie, length = INOTIFY_EVENT.unpack_from(events,offset)
+				offset += INOTIFY_EVENT.size
+				if events[offset:offset + length].rstrip(b'\0') == self.name:
+					changed = True
+				offset += length
+			return changed
+
+		try:
+			status = os.stat(self.trackingFile)
+		except OSError:
+			return False
+		return (status.st_mtime_ns,status.st_size,status.st_ino) != self.signature
+
+	def reload(self):
+
+		try:
+			status = os.stat(self.trackingFile)
+			self.signature = (status.st_mtime_ns,status.st_size,status.st_ino)
+			self.params = read_tracking_params(self.trackingFile)
+			self.reloads += 1
+		except (OSError,ValueError) as error:
+			print("\nKeeping the previous tracking parameters: {}".format(error))
+		return
+
+	def poll(self):
+
+		'''Returns the current TrackingParams, reloading the file first if it has changed'''
+
+		if self.changed():
+			self.reload()
+		return self.params
+
+	def close(self):
+
+		if self.fd is not None:
+			os.close(self.fd)
+			self.fd = None
+		return
+
+def objectEphemeris(trackingObject,longitude,latitude):
+
+	'''Returns the Ephemeris of the Sun or the Moon for an observer, importing only the modules that object needs'''
+
+	#Positions are precomputed over the next few hours and interpolated every update
+	from ephemeris import Ephemeris
+	if trackingObject == "Sun":
+		#The whole table is filled in one vectorized solar position calculation. The table holds positions without
+		#refraction, which is added to the interpolated elevation since it bends sharply near the horizon
+		from solarPosition import solarPosition, refraction
+		def unrefracted(timestamps):
+			return solarPosition(timestamps,latitude,longitude,refract=False)
+		def position(when):
+			azimuth, elevation = unrefracted([when])
+			return float(azimuth[0]), float(elevation[0])
+		return Ephemeris(position,batchFunction=unrefracted,refractionFunction=refraction)
+
+	#One MoonInfo is kept for the observer and only updated for each table sample
+	moon = getMoonTracker(latitude,longitude)
+	return Ephemeris(moon.position,batchFunction=moon.positions)
+
+def limitPosition(azimuthPosition,elevationPosition):
+
+	'''
+	Limits a pointing to the range of the mount. Returns (azimuth, elevation, limited) where limited is True if the
+	elevation was below the horizon and has been held at 0 degrees.
+	'''
+
+	#Elevations below the horizon are held at the horizon rather than mirrored into the sky
+	limited = elevationPosition < 0
+	if limited:
+		elevationPosition = 0.0
+
+	if azimuthPosition < 0:
+		azimuthPosition = 360+azimuthPosition
+	#if azimuthPosition > 180:
+	#	azimuthPosition = 360 - azimuthPosition
+
+	return azimuthPosition,elevationPosition,limited
+
+def scheduleFunction(ephemeris):
+
+	'''Returns a function(timestamps) giving the positions of an ephemeris' object for an ObservingSchedule'''
+
+	if ephemeris.batchFunction is not None:
+		return ephemeris.batchFunction
+
+	def positions(timestamps):
+		return zip(*[ephemeris.positionFunction(datetime.datetime.fromtimestamp(timestamp,datetime.timezone.utc))
+			for timestamp in timestamps])
+	return positions
+
+
+class TrackingEngine:
+
+	def __init__(self,azimuthController,elevationController,trackingObject,longitude,latitude,
+		predictivePointing=True,trackingMode="absolute",deadbandCounts=0,adaptiveUpdateRate=False,
+		pointingTolerance=0.005,closedLoop=False,observingSchedule=False,horizon=0.0,channel_num=1,
+		paramsFile=TRACKING_PARAMS_FILE,channelName=CHANNEL_NAME,ephemeris=None):
+
+		'''
+		Creates the tracking engine for one mount. The controllers must be connected, enabled and homed.
+		Input Arguements:
+			azimuthController, elevationController - ThorController of each axis
+
+			trackingObject - "Sun" or "Moon"
+
+			longitude, latitude - observer position in degrees
+
+			predictivePointing, trackingMode, deadbandCounts, adaptiveUpdateRate, pointingTolerance, closedLoop,
+			observingSchedule, horizon - the tracking settings, as the USER SETTINGS of solarTracking.py
+
+			paramsFile - tracking parameters file read while the GUI's control channel is not available, None for none
+
+			channelName - name of the GUI's shared memory control channel, None to not use it
+
+			ephemeris - an Ephemeris of the object, by default one is created for trackingObject
+		'''
+
+		if trackingMode not in ("absolute","velocity"):
+			raise ValueError('Invalid tracking mode {!r}, must be "absolute" or "velocity"'.format(trackingMode))
+
+		self.azimuthController = azimuthController
+		self.elevationController = elevationController
+		self.trackingObject = trackingObject
+		self.longitude = longitude
+		self.latitude = latitude
+		self.predictivePointing = predictivePointing
+		self.trackingMode = trackingMode
+		self.deadbandCounts = deadbandCounts
+		self.adaptiveUpdateRate = adaptiveUpdateRate
+		self.pointingTolerance = pointingTolerance
+		self.closedLoop = closedLoop and trackingMode == "absolute"
+		self.channel_num = channel_num
+		self.paramsFile = paramsFile
+		self.channelName = channelName
+
+		if ephemeris is None:
+			ephemeris = objectEphemeris(trackingObject,longitude,latitude)
+		self.ephemeris = ephemeris
+
+		#Rises, sets and visibility windows of the object, None to track whatever its elevation
+		self.schedule = None
+		if observingSchedule:
+			from observingSchedule import ObservingSchedule
+			self.schedule = ObservingSchedule(scheduleFunction(ephemeris),horizon)
+		self.state = "Tracking"
+		self.parks = 0
+		self.nextRise = None
+
+		self.params = DEFAULT_PARAMS
+		self.updateInterval = self.params.updateRate
+		self.azimuthPosition = None
+		self.elevationPosition = None
+		self.running = False
+
+		self.scheduler = None
+		self.channel = None
+		self.paramsWatcher = None
+
+	def slew(self,when=None):
+
+		'''
+		Moves both axes to the object's current position at the move profile and waits for them to arrive.
+		While the object is below the horizon the axes are moved to where it will next rise instead, and the engine
+		waits there (as after a pre-slew) rather than parking.
+		'''
+
+		azimuthPosition,elevationPosition = self.slewTarget(when)
+
+		wait_all([self.azimuthController.Move_Absolute(azimuthPosition,self.channel_num,wait=False),
+			self.elevationController.Move_Absolute(elevationPosition,self.channel_num,wait=False)])
+
+		rise = self.riseTime(when)
+		if rise is not None:
+			self.state = "Pre-slewed"
+			self.nextRise = rise
+		return azimuthPosition,elevationPosition
+
+	def riseTime(self,when=None):
+
+		'''Returns the timestamp of the next rise while the object is below the horizon, otherwise None'''
+
+		timestamp = time.time() if when is None else when
+		if isinstance(timestamp,datetime.datetime):
+			timestamp = timestamp.timestamp()
+
+		if self.schedule is None or self.schedule.visible(timestamp):
+			return None
+		return self.schedule.nextRise(timestamp)
+
+	def slewTarget(self,when=None):
+
+		'''Returns the position slew() moves to; the object's position, or its next rise position while it is down'''
+
+		timestamp = time.time() if when is None else when
+		if isinstance(timestamp,datetime.datetime):
+			timestamp = timestamp.timestamp()
+
+		rise = self.riseTime(timestamp)
+		if rise is not None:
+			timestamp = rise
+
+		azimuthPosition,elevationPosition = self.ephemeris.position(timestamp)
+		azimuthPosition,elevationPosition,limited = limitPosition(azimuthPosition,elevationPosition)
+		self.azimuthPosition,self.elevationPosition = azimuthPosition,elevationPosition
+		return azimuthPosition,elevationPosition
+
+	def start(self):
+
+		'''Sets up the axes and the tracking parameter sources for step()'''
+
+		#Measured latency of each axis' moves
+		self.azimuthLatency = MoveLatency()
+		self.elevationLatency = MoveLatency()
+
+		#Moves that would not change the commanded encoder count of an axis are skipped
+		self.azimuthDeadband = AxisDeadband(self.azimuthController,self.deadbandCounts,self.channel_num)
+		self.elevationDeadband = AxisDeadband(self.elevationController,self.deadbandCounts,self.channel_num)
+
+		#Velocity axes are started by resume() once the object is up if slew() left the mount at the rise position
+		if self.trackingMode == "velocity" and self.state == "Tracking":
+			self.azimuthAxis = VelocityAxis(self.azimuthController,self.channel_num)
+			self.elevationAxis = VelocityAxis(self.elevationController,self.channel_num)
+		elif self.closedLoop:
+			self.azimuthAxis = ClosedLoopAxis(self.azimuthController,self.azimuthDeadband,self.channel_num)
+			self.elevationAxis = ClosedLoopAxis(self.elevationController,self.elevationDeadband,self.channel_num)
+
+		#Offsets are read from the GUI's shared memory channel (see trackingChannel.py), or from the parameters
+		#file while the GUI is not running, which is only read again when it changes
+		if self.channelName is not None:
+			self.channel = openChannel(self.channelName)
+		self.channelRetry = time.monotonic() + CHANNEL_RETRY
+		if self.paramsFile is not None:
+			self.paramsWatcher = ParamsWatcher(self.paramsFile,self.params)
+
+		#Updates run on a fixed grid of deadlines so the work of each update does not add to updateRate
+		self.updateInterval = self.params.updateRate
+		self.scheduler = TickScheduler(self.updateInterval,TICK_CATCH_UP)
+		self.running = True
+		return self
+
+	def readParams(self):
+
+		'''Returns the latest TrackingParams from the GUI's control channel or the parameters file'''
+
+		if self.channelName is not None:
+			if self.channel is not None and self.channel.closed:
+				self.channel = None
+			if self.channel is None and time.monotonic() >= self.channelRetry:
+				self.channel = openChannel(self.channelName)
+				self.channelRetry = time.monotonic() + CHANNEL_RETRY
+			if self.channel is not None:
+				return self.channel.read(self.params)
+
+		#The GUI is not running, fall back to the parameters file
+		if self.paramsWatcher is not None:
+			return self.paramsWatcher.poll()
+		return self.params
+
+	def wait(self):
+
+		'''Sleeps until the next update is due'''
+
+		return self.scheduler.wait(self.updateInterval)
+
+	def step(self,now=None,params=None):
+
+		'''
+		Runs one tracking update; computes the positions and sends the moves without waiting for them.
+		Input Arguements:
+			now - POSIX timestamp to point for, defaults to time.time()
+
+			params - TrackingParams to use instead of reading the control channel or parameters file
+
+		Returns False once the tracking parameters ask for tracking to stop, True otherwise.
+		'''
+
+		#get Offsets and calculate current positions
+		self.params = params if params is not None else self.readParams()
+
+		Current_Time = time.time() if now is None else now
+
+		#The mount is parked and nothing is sent while the object is down
+		if self.schedule is not None and not self.schedule.visible(Current_Time):
+			self.idle(Current_Time)
+			self.running = self.params.killTracking != 1
+			return self.running
+		if self.state != "Tracking":
+			self.resume()
+
+		azimuthRate,elevationRate = self.ephemeris.rates(Current_Time)
+		if self.adaptiveUpdateRate:
+			self.updateInterval = adaptiveUpdateInterval(azimuthRate,elevationRate,self.pointingTolerance,
+				self.predictivePointing)
+		else:
+			self.updateInterval = self.params.updateRate
+		#Get New Positions
+		if self.trackingMode == "velocity":
+			#The axes follow the object continuously, its current position is only used for the corrections
+			azimuthPosition,elevationPosition = self.ephemeris.position(Current_Time)
+		elif self.predictivePointing:
+			#Each axis is held at its new position from when the move completes until the next move completes,
+			#so point at where the object will be halfway through that time instead of where it is now
+			azimuthPosition = self.ephemeris.position(Current_Time + self.azimuthLatency.latency + self.updateInterval/2.0)[0]
+			elevationPosition = self.ephemeris.position(Current_Time + self.elevationLatency.latency + self.updateInterval/2.0)[1]
+		else:
+			azimuthPosition,elevationPosition = self.ephemeris.position(Current_Time)
+
+		azimuthPosition += self.params.azimuthOffset
+		elevationPosition += self.params.elevationOffset
+
+		azimuthPosition,elevationPosition,limited = limitPosition(azimuthPosition,elevationPosition)
+		if limited:
+			#Held at the horizon
+			elevationRate = 0.0
+		self.azimuthPosition,self.elevationPosition = azimuthPosition,elevationPosition
+
+		#Move to New positions
+		if self.trackingMode == "velocity":
+			self.elevationAxis.update(elevationPosition,elevationRate,Current_Time)
+			self.azimuthAxis.update(azimuthPosition,azimuthRate,Current_Time)
+		else:
+			#In closed loop the moves go through the feedback axes, which use the same deadbands
+			if self.closedLoop:
+				elevationMove,azimuthMove = self.elevationAxis.move,self.azimuthAxis.move
+			else:
+				elevationMove,azimuthMove = self.elevationDeadband.move,self.azimuthDeadband.move
+
+			move = elevationMove(elevationPosition)
+			if move is not None:
+				self.elevationLatency.track(move)
+			move = azimuthMove(azimuthPosition)
+			if move is not None:
+				self.azimuthLatency.track(move)
+
+		self.running = self.params.killTracking != 1
+		return self.running
+
+	def idle(self,now):
+
+		'''
+		Called by step() while the object is below the horizon. Parks the mount once, then does nothing until
+		PRESLEW_LEAD seconds before the next rise, when the axes are slewed to the rise position. The next update
+		is timed for the pre-slew, but is never more than PARKED_UPDATE_INTERVAL away so a stop is still seen.
+		A mount already at the next rise position, from the pre-slew or from slew(), is left there.
+		'''
+
+		rise = self.schedule.nextRise(now)
+		atRise = self.state == "Pre-slewed" and rise == self.nextRise
+		if rise is not None and (atRise or rise - now <= PRESLEW_LEAD):
+			if not atRise:
+				self.park(rise)
+				self.state = "Pre-slewed"
+				self.nextRise = rise
+			self.updateInterval = max(MIN_UPDATE_INTERVAL,min(PARKED_UPDATE_INTERVAL,rise - now))
+			return
+
+		if self.state != "Parked":
+			self.park()
+			self.state = "Parked"
+			self.parks += 1
+		self.nextRise = rise
+		wake = PARKED_UPDATE_INTERVAL if rise is None else rise - PRESLEW_LEAD - now
+		self.updateInterval = max(MIN_UPDATE_INTERVAL,min(PARKED_UPDATE_INTERVAL,wake))
+		return
+
+	def park(self,rise=None):
+
+		'''
+		Stops tracking and moves the elevation axis to PARK_ELEVATION, or with rise moves both axes to the object's
+		position at that time. The moves are not waited for.
+		'''
+
+		if self.trackingMode == "velocity" and self.state == "Tracking" and self.scheduler is not None:
+			#Stops the axes and their automatic status updates
+			self.elevationAxis.stop()
+			self.azimuthAxis.stop()
+
+		if rise is None:
+			self.elevationController.Move_Absolute(PARK_ELEVATION,self.channel_num,wait=False)
+		else:
+			azimuthPosition,elevationPosition = self.slewTarget(rise)
+			self.azimuthController.Move_Absolute(azimuthPosition,self.channel_num,wait=False)
+			self.elevationController.Move_Absolute(elevationPosition,self.channel_num,wait=False)
+
+		#The axes are no longer where tracking left them
+		if self.scheduler is not None:
+			for deadband in (self.azimuthDeadband,self.elevationDeadband):
+				deadband.commanded = None
+			if self.closedLoop:
+				for axis in (self.azimuthAxis,self.elevationAxis):
+					axis.target = None
+		return
+
+	def resume(self):
+
+		#The object has risen; the velocity axes are started again
+		if self.trackingMode == "velocity" and self.scheduler is not None:
+			self.azimuthAxis = VelocityAxis(self.azimuthController,self.channel_num)
+			self.elevationAxis = VelocityAxis(self.elevationController,self.channel_num)
+		self.state = "Tracking"
+		return
+
+	def status(self):
+
+		'''Returns the status line of the last update'''
+
+		if self.state == "Parked":
+			rise = "no rise in the next day" if self.nextRise is None else \
+				"until " + datetime.datetime.fromtimestamp(self.nextRise).strftime('%H:%M:%S')
+			return "Parked, {} is below the horizon {}".format(self.trackingObject,rise)
+		if self.state == "Pre-slewed":
+			return "Waiting at the rise position of the {}".format(self.trackingObject)
+
+		line = "Azimuth: {}\t\tElevation: {}".format(round(self.azimuthPosition,4),round(self.elevationPosition,4))
+		#The deadband only skips absolute moves
+		if self.trackingMode != "velocity":
+			line += "\t\tSkipped Moves: {}/{}".format(self.azimuthDeadband.suppressed,self.elevationDeadband.suppressed)
+		if self.closedLoop:
+			line += "\t\tError: {}/{} {}/{}".format(round(self.azimuthAxis.error,4),round(self.elevationAxis.error,4),
+				self.azimuthAxis.state,self.elevationAxis.state)
+		return line
+
+	def summary(self):
+
+		'''Returns the lines of the end of tracking summary'''
+
+		lines = [self.scheduler.summary()]
+		if self.schedule is not None:
+			lines.append('Parked {} times while the {} was below the horizon'.format(self.parks,self.trackingObject))
+		if self.trackingMode != "velocity":
+			for axis, deadband in (("Azimuth",self.azimuthDeadband),("Elevation",self.elevationDeadband)):
+				total = deadband.sent + deadband.suppressed
+				lines.append('{}: {} of {} moves suppressed by the deadband'.format(axis,deadband.suppressed,total))
+		if self.closedLoop:
+			for axis, feedback in (("Azimuth",self.azimuthAxis),("Elevation",self.elevationAxis)):
+				lines.append('{}: {} stalls and {} slips detected, final correction {} degrees'.format(axis,feedback.stalls,
+					feedback.slips,round(feedback.correction,5)))
+		return lines
+
+	def stop(self):
+
+		'''Stops the axes and closes the tracking parameter sources. The controllers are left connected'''
+
+		if self.trackingMode == "velocity" and self.scheduler is not None and self.state == "Tracking":
+			self.elevationAxis.stop()
+			self.azimuthAxis.stop()
+
+		if self.channel is not None:
+			self.channel.close()
+			self.channel = None
+		if self.paramsWatcher is not None:
+			self.paramsWatcher.close()
+			self.paramsWatcher = None
+		self.running = False
+		return
+
+	def run(self):
+
+		'''Tracks until the tracking parameters ask for it to stop, printing the status line every update'''
+
+		self.start()
+		try:
+			while True:
+				self.wait()
+				running = self.step()
+				print("\r\t\t" + self.status(),end='')
+
+				#Break from loop with user input
+				if not running:
+					print('\nTracking Terminated')
+					break
+		finally:
+			self.stop()
+
+		for line in self.summary():
+			print('\t' + line)
+		return